@@ -0,0 +1,22 @@
+"""
+Process-wide registry for the shared CVEAnalystAPI instance
+"""
+import threading
+from typing import Dict, Tuple
+
+from config.settings import CVEConfig
+from api.cve_analyst_api import CVEAnalystAPI
+
+_lock = threading.Lock()
+_analysts: Dict[Tuple, CVEAnalystAPI] = {}
+
+def get_analyst(config: CVEConfig) -> CVEAnalystAPI:
+    """Get CVEAnalystAPI for config, loading the model only once per process"""
+    key = (str(config.model_dir), config.model_name, config.quantization, config.compile_model)
+    
+    with _lock:
+        analyst = _analysts.get(key)
+        if analyst is None:
+            analyst = CVEAnalystAPI(config)
+            _analysts[key] = analyst
+        return analyst
@@ -0,0 +1,86 @@
+"""
+Dynamic request batching for CVE analysis
+"""
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Optional
+
+from api.cve_analyst_api import CVEAnalystAPI
+
+logger = logging.getLogger(__name__)
+
+class BatchingScheduler:
+    """Collect concurrent analysis requests into batched generate calls"""
+    
+    def __init__(self, analyst: CVEAnalystAPI, executor: Executor,
+                 max_batch: int = 8, max_wait_ms: int = 10):
+        self.analyst = analyst
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the background batching task on the running loop"""
+        if self._task is None:
+            self.queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background batching task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def submit(self, cve_id: str, instruction: str) -> str:
+        """Queue a request and wait for its analysis"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((cve_id, instruction, future))
+        return await future
+    
+    async def _collect(self) -> list:
+        """Wait for one request, then gather more for up to max_wait"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        return batch
+    
+    async def _run(self):
+        """Drain the queue and run each batch on the generation executor"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = await self._collect()
+            requests = [(cve_id, instruction) for cve_id, instruction, _ in batch]
+            
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.analyst.analyze_cve_batch, requests
+                )
+            except Exception as e:
+                logger.error(f"Batched analysis failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
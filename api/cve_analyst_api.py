@@ -2,19 +2,59 @@
 CVE Analyst API module
 """
 import sqlite3
+import string
+import time
 import logging
-from typing import Optional
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
 import torch
 
 
 from config.settings import CVEConfig
-from database.models import CVEDatabase
+from database.models import get_db
+from transformers import StoppingCriteria, StoppingCriteriaList
 from transformers.utils import logging as hf_logging
 
 logger = logging.getLogger(__name__)
 hf_logging.set_verbosity_info()
 info_logger = hf_logging.get_logger("transformers")
 
+# Generation shape constants; prompts are padded to a multiple of
+# PROMPT_BUCKET so the compiled static-cache graph is reused across requests
+MAX_PROMPT_LENGTH = 1024
+MAX_NEW_TOKENS = 512
+PROMPT_BUCKET = 128
+
+# Analysis results cache; TTL lets refreshed CVE data reach the model again
+ANALYSIS_CACHE_SIZE = 1024
+ANALYSIS_CACHE_TTL = 3600
+
+PROMPT_TEMPLATE = (
+    "### Instruction:\n{instruction}\n\n"
+    "### Input:\n"
+    "CVE ID: {cve_id}\n"
+    "Description: {description}\n"
+    "Severity: {severity}\n"
+    "CWE: {cwe_id}\n\n"
+    "### Response:\n"
+)
+
+# Static scaffolding of the template and the variable fields between it
+_PARSED_TEMPLATE = list(string.Formatter().parse(PROMPT_TEMPLATE))
+PROMPT_SEGMENTS = tuple(literal for literal, _, _, _ in _PARSED_TEMPLATE)
+PROMPT_FIELDS = tuple(field for _, field, _, _ in _PARSED_TEMPLATE if field)
+
+class CancelledCriteria(StoppingCriteria):
+    """Stop generation once the streaming client has gone away"""
+    
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+    
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.cancelled.is_set()
+
 class CVEAnalystAPI:
     """API untuk CVE analysis menggunakan trained model"""
     
@@ -22,37 +62,78 @@ class CVEAnalystAPI:
         self.config = config
         self.model = None
         self.tokenizer = None
-        self.db = CVEDatabase()
+        self.segment_ids = []
+        self._pinned_inputs = None
+        self._pinned_lock = threading.Lock()
+        self._copy_done = None
+        # One generate at a time: static KV cache and CUDA graphs are shared
+        self._generate_lock = threading.Lock()
+        self.db = get_db()
+        self._analysis_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Fused attention kernels preferred; autograd is disabled per generate
+        # call (inference_mode in _generate), since grad mode is thread-local
+        if torch.cuda.is_available():
+            torch.backends.cuda.enable_flash_sdp(True)
+            torch.backends.cuda.enable_mem_efficient_sdp(True)
+        
         self.load_model()
     
     def load_model(self):
         """Load trained model"""
         try:
-            from transformers import AutoTokenizer, AutoModelForCausalLM
+            from transformers import AutoTokenizer
             
             model_path = self.config.model_dir / "cve-analyst-model"
             
-            if model_path.exists():
+            # config.json marks a complete checkpoint, adapter_config.json a
+            # LoRA adapter from the trainer; anything else falls through to the base model
+            if (model_path / "config.json").exists() or (model_path / "adapter_config.json").exists():
                 self.tokenizer = AutoTokenizer.from_pretrained(str(model_path))
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    str(model_path),
-                    torch_dtype=torch.float16,
-                    device_map="auto"
-                )
+                self.model = self._load_causal_lm(str(model_path))
                 logger.info("Trained model loaded successfully")
             else:
                 info_logger.info("Trained model not found, loading base model")
                 logger.warning("Trained model not found, using base model")
                 # Load the base model
+                # Same device placement and quantization as a trained checkpoint
                 self.tokenizer = AutoTokenizer.from_pretrained(self.config.model_name)
-                self.model = AutoModelForCausalLM.from_pretrained(self.config.model_name)
-
-                # Create the model directory if it doesn't exist
-                model_path.mkdir(parents=True, exist_ok=True)
+                self.model = self._load_causal_lm(self.config.model_name)
 
-                # Save the base model and tokenizer to the new path
-                self.tokenizer.save_pretrained(str(model_path))
-                self.model.save_pretrained(str(model_path))
+                # Save the base model and tokenizer so later cold starts load it
+                # locally, but never over an existing (possibly partial) checkpoint,
+                # and never quantized weights (they would be reloaded as the fp16 base)
+                if model_path.exists() and any(model_path.iterdir()):
+                    logger.warning(f"{model_path} is not empty, not saving base model there")
+                elif getattr(self.model.config, "quantization_config", None) is not None:
+                    logger.info("Base model loaded quantized, not saving a local copy")
+                else:
+                    model_path.mkdir(parents=True, exist_ok=True)
+                    self.tokenizer.save_pretrained(str(model_path))
+                    self.model.save_pretrained(str(model_path), safe_serialization=True)
+            
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.tokenizer.padding_side = "left"
+            
+            # Pre-encode the static prompt scaffolding once
+            self.segment_ids = self.tokenizer(
+                list(PROMPT_SEGMENTS),
+                add_special_tokens=False
+            ).input_ids
+            
+            # Reusable page-locked staging buffers for async H2D input copies
+            if self.model.device.type == "cuda":
+                self._pinned_inputs = (
+                    torch.empty((1, MAX_PROMPT_LENGTH), dtype=torch.long, pin_memory=True),
+                    torch.empty((1, MAX_PROMPT_LENGTH), dtype=torch.long, pin_memory=True)
+                )
+            
+            if self.config.compile_model:
+                self._compile_model()
                 
         except ImportError:
             logger.error("Transformers library not available")
@@ -63,53 +144,351 @@ class CVEAnalystAPI:
             self.model = None
             self.tokenizer = None
     
+    def _load_causal_lm(self, model_path: str):
+        """Load causal LM with weight-only quantization from config.quantization"""
+        from transformers import AutoModelForCausalLM
+        
+        quantization = (self.config.quantization or "none").lower()
+        is_adapter = (Path(model_path) / "adapter_config.json").exists()
+        
+        kwargs = {
+            "torch_dtype": torch.float16,
+            "device_map": "auto",
+            "attn_implementation": self._attn_implementation()
+        }
+        
+        if quantization == "awq":
+            # AWQ weights come pre-quantized; transformers reads the scheme from config.json
+            if not is_adapter and self._checkpoint_quant_method(model_path) == "awq":
+                return AutoModelForCausalLM.from_pretrained(model_path, **kwargs)
+            logger.warning(f"{model_path} is not an AWQ checkpoint, loading fp16 weights")
+        elif quantization in ("int8", "nf4"):
+            from transformers import BitsAndBytesConfig
+            
+            if quantization == "int8":
+                kwargs["quantization_config"] = BitsAndBytesConfig(
+                    load_in_8bit=True,
+                    llm_int8_threshold=6.0
+                )
+            else:
+                kwargs["quantization_config"] = BitsAndBytesConfig(
+                    load_in_4bit=True,
+                    bnb_4bit_quant_type="nf4",
+                    bnb_4bit_compute_dtype=torch.float16
+                )
+        elif quantization != "none":
+            logger.warning(f"Unknown quantization '{quantization}', loading fp16 weights")
+        
+        if is_adapter:
+            # LoRA adapter: base model from adapter_config.json + adapter weights
+            from peft import AutoPeftModelForCausalLM
+            
+            model = AutoPeftModelForCausalLM.from_pretrained(model_path, **kwargs)
+            # fp16 base: fold the adapter into the weights for plain-model decode speed
+            if "quantization_config" not in kwargs:
+                model = model.merge_and_unload()
+            return model
+        
+        return AutoModelForCausalLM.from_pretrained(model_path, **kwargs)
+    
+    @staticmethod
+    def _checkpoint_quant_method(model_path: str) -> Optional[str]:
+        """quant_method from the checkpoint's config.json quantization_config, if any"""
+        from transformers import AutoConfig
+        
+        try:
+            quantization_config = getattr(AutoConfig.from_pretrained(model_path), "quantization_config", None)
+        except Exception:
+            return None
+        if isinstance(quantization_config, dict):
+            return quantization_config.get("quant_method")
+        return getattr(quantization_config, "quant_method", None)
+    
+    def _attn_implementation(self) -> str:
+        """Prefer FlashAttention-2, fall back to PyTorch SDPA"""
+        try:
+            import flash_attn  # noqa: F401
+            return "flash_attention_2"
+        except ImportError:
+            return "sdpa"
+    
+    def _compile_model(self):
+        """Compile the decode step with a static KV cache and warm it up"""
+        eager_forward = self.model.forward
+        try:
+            self.model.generation_config.cache_implementation = "static"
+            self.model.forward = torch.compile(
+                self.model.forward,
+                mode="reduce-overhead",
+                fullgraph=True
+            )
+            
+            # Warmup so the first user request doesn't pay for compilation
+            inputs = self._pad_inputs(self._encode_prompt(
+                "Warmup",
+                {"cve_id": "", "description": "", "severity": "", "cwe_id": ""}
+            ))
+            self._generate(**inputs, **self._generation_kwargs())
+            logger.info("Model compiled with static KV cache")
+        except Exception as e:
+            self.model.forward = eager_forward
+            logger.warning(f"torch.compile unavailable, using eager generation: {e}")
+    
+    def _encode_prompt(self, instruction: str, cve_data: dict) -> list:
+        """Encode prompt from cached segment ids plus the variable fields"""
+        values = {**cve_data, 'instruction': instruction}
+        field_ids = self.tokenizer(
+            [str(values[field]) for field in PROMPT_FIELDS],
+            add_special_tokens=False
+        ).input_ids
+        
+        input_ids = []
+        for segment, field in zip(self.segment_ids, field_ids):
+            input_ids.extend(segment)
+            input_ids.extend(field)
+        input_ids.extend(self.segment_ids[-1])
+        
+        input_ids = self.tokenizer.build_inputs_with_special_tokens(input_ids)
+        return input_ids[:MAX_PROMPT_LENGTH]
+    
+    def _pad_inputs(self, input_ids: list):
+        """Left-pad input ids to a bucketed length"""
+        bucket = -(-len(input_ids) // PROMPT_BUCKET) * PROMPT_BUCKET
+        length = min(bucket, MAX_PROMPT_LENGTH)
+        
+        if self._pinned_inputs is None:
+            inputs = self.tokenizer.pad(
+                {"input_ids": [input_ids]},
+                padding="max_length",
+                max_length=length,
+                return_tensors="pt"
+            )
+            return inputs.to(self.model.device)
+        
+        pad = length - len(input_ids)
+        with self._pinned_lock:
+            # The previous copy must finish before its staging buffer is reused
+            if self._copy_done is not None:
+                self._copy_done.synchronize()
+            
+            ids_buffer = self._pinned_inputs[0][:, :length]
+            mask_buffer = self._pinned_inputs[1][:, :length]
+            ids_buffer[0, :pad] = self.tokenizer.pad_token_id
+            ids_buffer[0, pad:] = torch.as_tensor(input_ids, dtype=torch.long)
+            mask_buffer[0, :pad] = 0
+            mask_buffer[0, pad:] = 1
+            
+            inputs = {
+                "input_ids": ids_buffer.to(self.model.device, non_blocking=True),
+                "attention_mask": mask_buffer.to(self.model.device, non_blocking=True)
+            }
+            self._copy_done = torch.cuda.Event()
+            self._copy_done.record()
+        
+        return inputs
+    
+    def _pad_batch(self, batch_ids: List[list]):
+        """Left-pad several prompts to a common bucketed length"""
+        if len(batch_ids) == 1:
+            return self._pad_inputs(batch_ids[0])
+        
+        longest = max(len(input_ids) for input_ids in batch_ids)
+        bucket = -(-longest // PROMPT_BUCKET) * PROMPT_BUCKET
+        inputs = self.tokenizer.pad(
+            {"input_ids": batch_ids},
+            padding="max_length",
+            max_length=min(bucket, MAX_PROMPT_LENGTH),
+            return_tensors="pt"
+        )
+        return inputs.to(self.model.device)
+    
+    def _generation_kwargs(self) -> dict:
+        """Fixed generation arguments shared by warmup and inference"""
+        return {
+            "max_new_tokens": MAX_NEW_TOKENS,
+            "do_sample": False,
+            "pad_token_id": self.tokenizer.eos_token_id,
+            "cache_implementation": "static" if self.config.compile_model else None
+        }
+    
+    def _generate(self, **kwargs):
+        """Run model.generate under the generate lock, without autograd"""
+        with self._generate_lock, torch.inference_mode():
+            return self.model.generate(**kwargs)
+    
     def analyze_cve(self, cve_id: str, instruction: str = "Analyze this CVE") -> str:
         """Analyze CVE using trained model"""
         if not self.model or not self.tokenizer:
             return "Model not available. Please check model installation."
         
+        cache_key = (cve_id, instruction)
+        cached = self._get_cached_analysis(cache_key)
+        if cached is not None:
+            return cached
+        
         # Get CVE data from database
         cve_data = self.db.get_cve(cve_id)
         
         if not cve_data:
             return f"CVE {cve_id} not found in database"
         
-        # Format prompt
-        prompt = f"""### Instruction:
-{instruction}
-
-### Input:
-CVE ID: {cve_data['cve_id']}
-Description: {cve_data['description']}
-Severity: {cve_data['severity']}
-CWE: {cve_data['cwe_id']}
-
-### Response:
-"""
-        
         try:
             # Generate response
-            inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=1024)
-            
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=512,
-                    temperature=0.7,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id
-                )
+            inputs = self._pad_inputs(self._encode_prompt(instruction, cve_data))
+            
+            outputs = self._generate(**inputs, **self._generation_kwargs())
             
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            # Extract only the generated part
-            response = response[len(prompt):].strip()
+            # Decode only the generated part
+            new_tokens = outputs[0, inputs["input_ids"].shape[1]:]
+            response = self.tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
             
+            self._cache_analysis(cache_key, response)
             return response
             
         except Exception as e:
             logger.error(f"Error during inference: {e}")
             return f"Error analyzing CVE: {str(e)}"
     
+    def _get_cached_analysis(self, key: tuple) -> Optional[str]:
+        """Return a fresh cached analysis, or None on miss"""
+        with self._cache_lock:
+            entry = self._analysis_cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ANALYSIS_CACHE_TTL:
+                self._analysis_cache.move_to_end(key)
+                self.cache_hits += 1
+                return entry[1]
+            
+            self._analysis_cache.pop(key, None)
+            self.cache_misses += 1
+            return None
+    
+    def _cache_analysis(self, key: tuple, response: str):
+        """Store analysis result, evicting least recently used entries"""
+        with self._cache_lock:
+            self._analysis_cache[key] = (time.monotonic(), response)
+            self._analysis_cache.move_to_end(key)
+            while len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+                self._analysis_cache.popitem(last=False)
+    
+    def cache_stats(self) -> dict:
+        """Get analysis cache hit/miss counters"""
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self._analysis_cache)
+        }
+    
+    def analyze_cve_batch(self, requests: List[Tuple[str, str]]) -> List[str]:
+        """Analyze several (cve_id, instruction) pairs with one generate call"""
+        if not self.model or not self.tokenizer:
+            return ["Model not available. Please check model installation."] * len(requests)
+        
+        results = [None] * len(requests)
+        pending = []
+        
+        for index, (cve_id, instruction) in enumerate(requests):
+            cache_key = (cve_id, instruction)
+            cached = self._get_cached_analysis(cache_key)
+            if cached is not None:
+                results[index] = cached
+                continue
+            
+            cve_data = self.db.get_cve(cve_id)
+            if not cve_data:
+                results[index] = f"CVE {cve_id} not found in database"
+                continue
+            
+            pending.append((index, cache_key, self._encode_prompt(instruction, cve_data)))
+        
+        if not pending:
+            return results
+        
+        try:
+            inputs = self._pad_batch([input_ids for _, _, input_ids in pending])
+            
+            outputs = self._generate(**inputs, **self._generation_kwargs())
+            
+            # Prompts are left-padded, so generated tokens start at the same column
+            prompt_length = inputs["input_ids"].shape[1]
+            responses = self.tokenizer.batch_decode(
+                outputs[:, prompt_length:],
+                skip_special_tokens=True
+            )
+            
+            for (index, cache_key, _), response in zip(pending, responses):
+                response = response.strip()
+                self._cache_analysis(cache_key, response)
+                results[index] = response
+                
+        except Exception as e:
+            logger.error(f"Error during batched inference: {e}")
+            for index, _, _ in pending:
+                results[index] = f"Error analyzing CVE: {str(e)}"
+        
+        return results
+    
+    def analyze_cve_stream(self, cve_id: str, instruction: str = "Analyze this CVE") -> Iterator[str]:
+        """Analyze CVE, yielding text chunks as they are generated"""
+        if not self.model or not self.tokenizer:
+            yield "Model not available. Please check model installation."
+            return
+        
+        cache_key = (cve_id, instruction)
+        cached = self._get_cached_analysis(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        cve_data = self.db.get_cve(cve_id)
+        if not cve_data:
+            yield f"CVE {cve_id} not found in database"
+            return
+        
+        from transformers import TextIteratorStreamer
+        
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        cancelled = threading.Event()
+        errors = []
+        inputs = self._pad_inputs(self._encode_prompt(instruction, cve_data))
+        
+        worker = threading.Thread(
+            target=self._stream_worker,
+            args=(inputs, streamer, cancelled, errors),
+            daemon=True
+        )
+        worker.start()
+        
+        chunks = []
+        try:
+            for text in streamer:
+                chunks.append(text)
+                yield text
+        finally:
+            # Client disconnected or finished; either way free the GPU
+            cancelled.set()
+            worker.join()
+        
+        # Only reached when the client consumed the whole stream; a failed
+        # generation must not be cached as the analysis
+        if errors:
+            yield f"\nError analyzing CVE: {errors[0]}"
+            return
+        self._cache_analysis(cache_key, "".join(chunks).strip())
+    
+    def _stream_worker(self, inputs, streamer, cancelled: threading.Event, errors: list):
+        """Run generate on a background thread, feeding the streamer"""
+        try:
+            self._generate(
+                **inputs,
+                **self._generation_kwargs(),
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([CancelledCriteria(cancelled)])
+            )
+        except Exception as e:
+            logger.error(f"Error during streaming inference: {e}")
+            errors.append(e)
+            streamer.end()
+    
     def get_cve_info(self, cve_id: str) -> Optional[dict]:
         """Get CVE information from database"""
         return self.db.get_cve(cve_id)
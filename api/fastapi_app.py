@@ -1,23 +1,67 @@
 """
 FastAPI application for CVE Analyst
 """
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional, List
 
 from config.settings import CVEConfig
-from api.cve_analyst_api import CVEAnalystAPI
+from api._registry import get_analyst
+from api.batching import BatchingScheduler
+
+logger = logging.getLogger(__name__)
 
 def create_fastapi_app(config: CVEConfig) -> FastAPI:
-    """Create FastAPI application"""
+    """Create FastAPI application; the model loads in the lifespan so the port binds immediately"""
+    # Filled in by the lifespan once the model is loaded
+    state = {}
+    ready = asyncio.Event()
+    
+    # Single persistent generation thread keeps blocking CUDA work off the event loop
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cve-generate")
+    
+    async def _deferred_init():
+        """Load the analyst off the event loop, then start batching"""
+        try:
+            analyst = await asyncio.to_thread(get_analyst, config)
+            state['analyst'] = analyst
+            if analyst.model is None:
+                state['error'] = "Model failed to load"
+                return
+            state['scheduler'] = BatchingScheduler(analyst, executor)
+            state['scheduler'].start()
+            ready.set()
+        except Exception as e:
+            logger.error(f"Error loading CVE analyst: {e}")
+            state['error'] = str(e)
+    
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        init_task = asyncio.create_task(_deferred_init())
+        yield
+        init_task.cancel()
+        if 'scheduler' in state:
+            await state['scheduler'].stop()
+        executor.shutdown(wait=False)
+    
     app = FastAPI(
         title="CVE Analyst API", 
         version="1.0.0",
-        description="AI-powered CVE analysis and security recommendations"
+        description="AI-powered CVE analysis and security recommendations",
+        lifespan=lifespan
     )
     
-    analyst = CVEAnalystAPI(config)
+    def _analyst():
+        """Loaded analyst, or 503 while the model is still warming up"""
+        if not ready.is_set():
+            raise HTTPException(status_code=503, detail=state.get('error', "Model is still loading"))
+        return state['analyst']
     
     class CVEAnalysisRequest(BaseModel):
         cve_id: str
@@ -32,19 +76,33 @@ def create_fastapi_app(config: CVEConfig) -> FastAPI:
     async def analyze_cve(request: CVEAnalysisRequest):
         """Analyze a CVE and provide security recommendations"""
         try:
-            result = analyst.analyze_cve(request.cve_id, request.instruction)
+            _analyst()
+            result = await state['scheduler'].submit(request.cve_id, request.instruction)
             return CVEAnalysisResponse(
                 cve_id=request.cve_id,
                 analysis=result,
                 timestamp=datetime.now().isoformat()
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
     
+    @app.post("/analyze/stream")
+    async def analyze_cve_stream(request: CVEAnalysisRequest):
+        """Stream CVE analysis as server-sent events while tokens are generated"""
+        analyst = _analyst()
+        
+        def events():
+            for chunk in analyst.analyze_cve_stream(request.cve_id, request.instruction):
+                yield "".join(f"data: {line}\n" for line in chunk.split("\n")) + "\n"
+        
+        return StreamingResponse(events(), media_type="text/event-stream")
+    
     @app.get("/cve/{cve_id}")
     async def get_cve_info(cve_id: str):
         """Get CVE information from database"""
-        cve_info = analyst.get_cve_info(cve_id)
+        cve_info = _analyst().get_cve_info(cve_id)
         if not cve_info:
             raise HTTPException(status_code=404, detail="CVE not found")
         return cve_info
@@ -52,15 +110,35 @@ def create_fastapi_app(config: CVEConfig) -> FastAPI:
     @app.get("/recent-cves")
     async def get_recent_cves(limit: int = 10):
         """Get recent CVEs"""
-        return analyst.get_recent_cves(limit=limit)
+        return _analyst().get_recent_cves(limit=limit)
     
     @app.get("/health")
     async def health_check():
         """Health check endpoint"""
+        analyst = state.get('analyst')
         return {
             "status": "healthy", 
             "timestamp": datetime.now().isoformat(),
-            "model_loaded": analyst.model is not None
+            "model_loaded": analyst is not None and analyst.model is not None,
+            "analysis_cache": analyst.cache_stats() if analyst else None
         }
     
+    @app.get("/health/live")
+    async def health_live():
+        """Liveness: the process is up and serving"""
+        return {"status": "alive"}
+    
+    @app.get("/health/ready")
+    async def health_ready():
+        """Readiness: 503 until the model has finished loading, or if it failed to load"""
+        if 'error' in state:
+            return JSONResponse(status_code=503, content={"status": "failed", "error": state['error']})
+        if not ready.is_set():
+            return JSONResponse(status_code=503, content={"status": "loading"})
+        return {"status": "ready"}
+    
     return app
+
+def app_factory() -> FastAPI:
+    """Zero-argument factory for multi-worker uvicorn (each worker builds its own app)"""
+    return create_fastapi_app(CVEConfig.from_env())
@@ -3,18 +3,22 @@ Gradio interface for CVE Analyst
 """
 import gradio as gr
 from config.settings import CVEConfig
-from api.cve_analyst_api import CVEAnalystAPI
+from api._registry import get_analyst
 
 def create_gradio_interface(config: CVEConfig):
     """Create Gradio interface"""
-    analyst = CVEAnalystAPI(config)
+    analyst = get_analyst(config)
     
     def analyze_cve_gradio(cve_id: str, instruction: str):
         """Analyze CVE for Gradio interface"""
         if not cve_id.strip():
-            return "Please enter a CVE ID"
+            yield "Please enter a CVE ID"
+            return
         
-        return analyst.analyze_cve(cve_id.strip(), instruction)
+        result = ""
+        for chunk in analyst.analyze_cve_stream(cve_id.strip(), instruction):
+            result += chunk
+            yield result
     
     def get_recent_cves_gradio():
         """Get recent CVEs for display"""
@@ -22,12 +26,11 @@ def create_gradio_interface(config: CVEConfig):
         if not recent_cves:
             return "No recent CVEs found"
         
-        result = "**Recent CVEs:**\n\n"
-        for cve in recent_cves:
-            result += f"- **{cve['cve_id']}** (Severity: {cve['severity']})\n"
-            result += f"  {cve['description'][:100]}...\n\n"
-        
-        return result
+        return "**Recent CVEs:**\n\n" + "".join(
+            f"- **{cve['cve_id']}** (Severity: {cve['severity']})\n"
+            f"  {cve['description'][:100]}...\n\n"
+            for cve in recent_cves
+        )
     
     # Create interface
     with gr.Blocks(title="CVE Security Analyst") as interface:
@@ -5,6 +5,7 @@ import gradio as gr
 import os
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import pandas as pd
@@ -21,29 +22,32 @@ class ModelTrainerConfig:
             'bert-base'
         ]
         self.max_file_size = 100 * 1024 * 1024  # 100MB
+        self.supported_format_set = frozenset(self.supported_formats)
 
 class ModelTrainerAPI:
     """API class for model training operations"""
     
     def __init__(self, config: ModelTrainerConfig):
         self.config = config
-        self.training_jobs = []
+        self.training_jobs = {}
         self.trained_models = []
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="training")
         
     def validate_dataset(self, file_path: str) -> Tuple[bool, str]:
         """Validate uploaded dataset"""
         if not file_path:
             return False, "No file uploaded"
         
-        if not os.path.exists(file_path):
+        try:
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
             return False, "File does not exist"
         
-        file_size = os.path.getsize(file_path)
-        if file_size > self.config.max_file_size:
+        if file_stat.st_size > self.config.max_file_size:
             return False, f"File too large. Max size: {self.config.max_file_size / 1024 / 1024:.1f}MB"
         
         file_ext = os.path.splitext(file_path)[1].lower()
-        if file_ext not in self.config.supported_formats:
+        if file_ext not in self.config.supported_format_set:
             return False, f"Unsupported format. Supported: {', '.join(self.config.supported_formats)}"
         
         return True, "Dataset validated successfully"
@@ -74,17 +78,16 @@ class ModelTrainerAPI:
             'logs': []
         }
         
-        self.training_jobs.append(training_job)
+        self.training_jobs[job_id] = training_job
         
-        # Simulate training process
-        self._simulate_training(job_id)
+        # Simulate training process off the request thread
+        self.executor.submit(self._simulate_training, job_id)
         
         return f"Training started successfully!\nJob ID: {job_id}\nModel: {model_name}\nBase Model: {base_model}"
     
     def _simulate_training(self, job_id: str):
         """Simulate training progress"""
-        # In real implementation, this would be async
-        job = next((j for j in self.training_jobs if j['id'] == job_id), None)
+        job = self.training_jobs.get(job_id)
         if job:
             job['status'] = 'training'
             job['logs'].append(f"Training started at {datetime.now().strftime('%H:%M:%S')}")
@@ -94,39 +97,39 @@ class ModelTrainerAPI:
         if not self.training_jobs:
             return "No training jobs found"
         
-        status_text = "**Training Jobs Status:**\n\n"
+        parts = ["**Training Jobs Status:**\n\n"]
         
-        for job in self.training_jobs:
-            status_text += f"**{job['model_name']}** (ID: {job['id']})\n"
-            status_text += f"- Status: {job['status'].title()}\n"
-            status_text += f"- Base Model: {job['base_model']}\n"
-            status_text += f"- Progress: {job['progress']}%\n"
-            status_text += f"- Started: {job['start_time'][:19]}\n"
+        for job in self.training_jobs.values():
+            parts.append(
+                f"**{job['model_name']}** (ID: {job['id']})\n"
+                f"- Status: {job['status'].title()}\n"
+                f"- Base Model: {job['base_model']}\n"
+                f"- Progress: {job['progress']}%\n"
+                f"- Started: {job['start_time'][:19]}\n"
+            )
             
             if job['logs']:
-                status_text += f"- Latest Log: {job['logs'][-1]}\n"
+                parts.append(f"- Latest Log: {job['logs'][-1]}\n")
             
-            status_text += "\n"
+            parts.append("\n")
         
-        return status_text
+        return "".join(parts)
     
     def get_trained_models(self) -> str:
         """Get list of trained models"""
-        completed_jobs = [job for job in self.training_jobs if job['status'] == 'completed']
+        completed_jobs = [job for job in self.training_jobs.values() if job['status'] == 'completed']
         
         if not completed_jobs:
             return "No trained models available"
         
-        models_text = "**Trained Models:**\n\n"
-        
-        for job in completed_jobs:
-            models_text += f"**{job['model_name']}**\n"
-            models_text += f"- Base Model: {job['base_model']}\n"
-            models_text += f"- Training Completed: {job.get('end_time', 'Unknown')}\n"
-            models_text += f"- Dataset: {os.path.basename(job['dataset_path'])}\n"
-            models_text += f"- Parameters: LR={job['learning_rate']}, Batch={job['batch_size']}, Epochs={job['epochs']}\n\n"
-        
-        return models_text
+        return "**Trained Models:**\n\n" + "".join(
+            f"**{job['model_name']}**\n"
+            f"- Base Model: {job['base_model']}\n"
+            f"- Training Completed: {job.get('end_time', 'Unknown')}\n"
+            f"- Dataset: {os.path.basename(job['dataset_path'])}\n"
+            f"- Parameters: LR={job['learning_rate']}, Batch={job['batch_size']}, Epochs={job['epochs']}\n\n"
+            for job in completed_jobs
+        )
     
     def test_model(self, model_name: str, test_input: str) -> str:
         """Test a trained model"""
@@ -1,22 +1,31 @@
 from config.settings import ModelTrainerConfig
 from api.model_trainer_api import ModelTrainerAPI
-import gradio as gr
 import os
+from types import SimpleNamespace
 
 def create_gradio_interface(config: ModelTrainerConfig):
     """Create Gradio interface"""
+    import gradio as gr
+    
     api = ModelTrainerAPI(config)
-
-    def validate_dataset_ui(uploaded_file):
+    # Snapshot form defaults once instead of reading the config per component
+    defaults = SimpleNamespace(
+        lr=config.default_learning_rate,
+        bs=config.default_batch_size,
+        ep=config.default_epochs,
+        ml=config.max_sequence_length,
+    )
+
+    async def validate_dataset_ui(uploaded_file):
         if uploaded_file is None:
             return "error", "No file provided", {}
-        success, message, metadata = api.validate_dataset(uploaded_file.name)
-        return success, message, metadata
+        response = await api.avalidate_dataset(uploaded_file.name)
+        return response.status, response.message, response.metadata
 
     def start_training_ui(model_name, base_model, dataset_file, lr, batch_size, epochs, max_len, description):
         if None in [model_name, base_model, dataset_file]:
-            return "error", "Model name, base model, and dataset are required"
-        return api.start_training(
+            return "[ERR] Model name, base model, and dataset are required"
+        status, message = api.start_training(
             model_name=model_name,
             base_model=base_model,
             dataset_path=dataset_file.name,
@@ -26,6 +35,7 @@ def create_gradio_interface(config: ModelTrainerConfig):
             max_length=max_len,
             description=description or ""
         )
+        return f"[{'OK' if status == 'success' else 'ERR'}] {message}"
 
     
     def get_status_ui(job_id):
@@ -38,16 +48,14 @@ def create_gradio_interface(config: ModelTrainerConfig):
         return api.test_model(model_name, test_input)
 
     def cancel_job_ui(job_id):
-        success, msg = api.cancel_training(job_id)
-        return msg
+        return api.cancel_training(job_id).message
 
     def delete_model_ui(model_name):
-        success, msg = api.delete_model(model_name)
-        return msg
+        return api.delete_model(model_name).message
 
-    def export_model_ui(model_name, export_format):
-        success, msg = api.export_model(model_name, export_format)
-        return msg
+    async def export_model_ui(model_name, export_format):
+        response = await api.aexport_model(model_name, export_format)
+        return response.message
 
     with gr.Blocks(title="LLM Model Trainer") as demo:
         gr.Markdown("# 🧠 LLM Model Trainer Dashboard")
@@ -64,14 +72,14 @@ def create_gradio_interface(config: ModelTrainerConfig):
             name = gr.Textbox(label="Model Name")
             base = gr.Textbox(label="Base Model")
             ds_file = gr.File(label="Dataset file")
-            lr = gr.Number(label="Learning Rate", value=config.default_learning_rate)
-            bs = gr.Number(label="Batch Size", value=config.default_batch_size)
-            ep = gr.Number(label="Epochs", value=config.default_epochs)
-            ml = gr.Number(label="Max Length", value=config.max_sequence_length)
+            lr = gr.Number(label="Learning Rate", value=defaults.lr)
+            bs = gr.Number(label="Batch Size", value=defaults.bs)
+            ep = gr.Number(label="Epochs", value=defaults.ep)
+            ml = gr.Number(label="Max Length", value=defaults.ml)
             desc = gr.Textbox(label="Description")
             start_btn = gr.Button("Start")
             train_msg = gr.Textbox(label="Response")
-            start_btn.click(start_training_ui, inputs=[name, base, ds_file, lr, bs, ep, ml, desc], outputs=[train_msg, train_msg])
+            start_btn.click(start_training_ui, inputs=[name, base, ds_file, lr, bs, ep, ml, desc], outputs=[train_msg])
 
         with gr.Tab("Training Status"):
             jid = gr.Textbox(label="Job ID (leave blank for all)")
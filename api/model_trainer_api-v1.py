@@ -9,7 +9,6 @@ import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
-import pandas as pd
 from pathlib import Path
 
 # Setup logging
@@ -150,6 +149,7 @@ class ModelTrainerAPI:
         
         try:
             if file_ext == '.csv':
+                import pandas as pd
                 df = pd.read_csv(file_path, nrows=1000)  # Sample first 1000 rows
                 metadata['num_samples'] = len(df)
                 metadata['columns'] = df.columns.tolist()
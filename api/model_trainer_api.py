@@ -1,21 +1,68 @@
 """
 API module for LLM Model Trainer operations
 """
+import io
 import os
-import json
+import mmap
+import random
+import tarfile
+import zipfile
 import time
+import atexit
+import queue
+import orjson
 import logging
+import threading
+from collections import OrderedDict
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count, islice
 from datetime import datetime, timedelta
 from typing import Literal, Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
-import pandas as pd
 from pathlib import Path
+from sortedcontainers import SortedList
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Jeda debounce sebelum state ditulis ke disk (detik)
+STATE_FLUSH_DELAY = 0.25
+# Jumlah maksimum sampel yang dipindai saat analisis dataset
+MAX_SCAN_SAMPLES = 1000
+# Durasi simulasi satu training step (detik)
+STEP_DURATION = 0.5
+# Jumlah hasil validasi dataset yang disimpan di cache
+VALIDATION_CACHE_SIZE = 64
+# Channel Redis untuk push progress training ke UI
+REDIS_PROGRESS_CHANNEL = "trainer:progress"
+# Sorted set of job ids holding a training slot across all workers (score = lease expiry)
+REDIS_ACTIVE_KEY = "trainer:active"
+# Lease per slot (detik); worker pemilik memperbarui tiap step, worker mati melepas slot sendiri
+SLOT_LEASE = 60
+# Umur key cancel:<job_id> untuk job yang berjalan di worker lain (detik)
+CANCEL_KEY_TTL = 86400
+# Status akhir: record job tidak berubah lagi, tidak perlu dibaca ulang dari Redis
+TERMINAL_STATUSES = frozenset({'completed', 'failed', 'cancelled'})
+
+# Atomic check-and-take of a slot: drop expired leases, then add if under the limit
+_SLOT_ACQUIRE_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+return 1
+"""
+
+# Template respons simulasi untuk test_model
+_RESPONSE_TEMPLATES = (
+    "Based on my training with {base}, here's my response to '{input}': This is a simulated response that would be generated by your custom trained model.",
+    "Using the patterns learned from your dataset, I interpret '{input}' as follows: [Simulated model output based on training data]",
+    "Model '{name}' response: Your trained model would process this input and generate contextually appropriate output based on the training data.",
+)
+
 ResponseStatus = Literal['success', 'error', 'validation_error']
 
 @dataclass
@@ -35,6 +82,34 @@ class ValidationResponse(APIResponse):
 #                 metadata=metadata
 #             )
 
+_last_ts: Tuple[int, str] = (0, "")
+
+def _ts(t: Optional[float] = None) -> str:
+    """Format epoch seconds as local 'YYYY-MM-DD HH:MM:SS', reusing the string within the same second"""
+    global _last_ts
+    sec = int(time.time() if t is None else t)
+    cached = _last_ts
+    if cached[0] != sec:
+        cached = _last_ts = (sec, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sec)))
+    return cached[1]
+
+def _json_array(records: List[bytes]) -> bytes:
+    """Join pre-serialized JSON records into an array, one record per line"""
+    return b"[\n" + b",\n".join(records) + b"\n]"
+
+@dataclass
+class DatasetProbe:
+    """File facts derived from a single stat() of an uploaded dataset"""
+    path: str
+    size: int
+    ext: str
+    basename: str
+    mtime_ns: int
+    
+    @property
+    def cache_key(self) -> Tuple[str, int, int]:
+        return (self.path, self.mtime_ns, self.size)
+
 @dataclass
 class TrainingJob:
     """Training job data structure"""
@@ -48,18 +123,26 @@ class TrainingJob:
     batch_size: int
     epochs: int
     max_length: int
-    start_time: str
-    end_time: Optional[str] = None
+    start_time: float  # epoch seconds; formatted only when rendered
+    end_time: Optional[float] = None
     logs: List[str] = None
     error_message: Optional[str] = None
     model_path: Optional[str] = None
     metrics: Dict[str, float] = None
+    dataset_name: Optional[str] = None  # basename of dataset_path
     
     def __post_init__(self):
         if self.logs is None:
             self.logs = []
         if self.metrics is None:
             self.metrics = {}
+        # State files written before times were stored as floats hold ISO strings
+        if isinstance(self.start_time, str):
+            self.start_time = datetime.fromisoformat(self.start_time).timestamp()
+        if isinstance(self.end_time, str):
+            self.end_time = datetime.fromisoformat(self.end_time).timestamp()
+        if self.dataset_name is None:
+            self.dataset_name = os.path.basename(self.dataset_path)
 
 @dataclass
 class ModelInfo:
@@ -81,54 +164,347 @@ class ModelTrainerAPI:
         self.config = config
         self.training_jobs: Dict[str, TrainingJob] = {}
         self.trained_models: Dict[str, ModelInfo] = {}
-        self.active_jobs = 0
+        # Bounded pool for training workers; the semaphore is the atomic concurrency gate
+        self._pool = ThreadPoolExecutor(max_workers=config.max_concurrent_jobs, thread_name_prefix="trainer")
+        self._job_slots = threading.BoundedSemaphore(config.max_concurrent_jobs)
+        # (-start_time, job_id), newest first, maintained on insert so listings never re-sort
+        self._jobs_by_time = SortedList()
+        # LRU of validation results keyed by (path, mtime_ns, size); UI and start_training share it
+        self._validation_cache: "OrderedDict[Tuple[str, int, int], ValidationResponse]" = OrderedDict()
+        self._validation_lock = threading.Lock()
+        # Monotonic job sequence; the lock keeps concurrent starts from sharing an id
+        self._job_seq = count(1)
+        self._job_seq_lock = threading.Lock()
+        # Per-job cancellation flags; workers block on these instead of polling status
+        self._cancel_events: Dict[str, threading.Event] = {}
+        # Serializes cancel_training against a job's transition to 'completed'
+        self._status_lock = threading.Lock()
+        # Serialized records reused across flushes until the record changes
+        self._job_bytes_cache: Dict[str, Tuple[tuple, bytes]] = {}
+        self._model_bytes_cache: Dict[str, Tuple[ModelInfo, bytes]] = {}
+        # Last job record written to (or read from) Redis; unchanged records are skipped
+        self._redis_jobs: Dict[str, bytes] = {}
+        # Workers push (job_id, progress, log) here; one consumer applies them
+        self._progress_queue: "queue.Queue[Tuple[str, int, Optional[str]]]" = queue.Queue()
+        
+        # Optional shared store so multiple API workers see the same jobs/models
+        self.redis = self._connect_redis()
+        self._slot_script = self.redis.register_script(_SLOT_ACQUIRE_LUA) if self.redis else None
         
         # Load existing jobs and models
         self._load_state()
+        
+        # Mutations only mark state dirty; a background writer coalesces them into one dump
+        self._dirty = threading.Event()
+        self._writer_thread = threading.Thread(target=self._state_writer, name="trainer-state-writer", daemon=True)
+        self._writer_thread.start()
+        atexit.register(self._flush_state)
+        
+        self._progress_thread = threading.Thread(target=self._progress_consumer, name="trainer-progress", daemon=True)
+        self._progress_thread.start()
+    
+    @property
+    def active_jobs(self) -> int:
+        """Number of jobs currently holding a worker slot"""
+        return len(self._cancel_events)
+    
+    def _connect_redis(self):
+        """Connect to Redis when configured, otherwise keep state in-process"""
+        redis_url = getattr(self.config, 'redis_url', None)
+        if not redis_url:
+            return None
+        
+        try:
+            import redis
+        except ImportError:
+            logger.warning("redis not installed, job state stays in-process")
+            return None
+        
+        try:
+            client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(redis_url, max_connections=32))
+            client.ping()
+            return client
+        except Exception as e:
+            logger.error(f"Error connecting to Redis: {e}")
+            return None
+    
+    @staticmethod
+    def _parse_record(cls, raw: bytes):
+        """Decode a stored job/model record; None (logged) for malformed or old-schema records"""
+        try:
+            return cls(**orjson.loads(raw))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Skipping unreadable {cls.__name__} record: {e}")
+            return None
+    
+    def _refresh_jobs(self, job_ids: Optional[List[str]] = None):
+        """Pull job records from Redis: the given ids, or every job that may still change"""
+        if not self.redis:
+            return
+        
+        try:
+            if job_ids is None:
+                # Job yang sudah selesai tidak berubah lagi; cukup baca yang baru/aktif
+                job_ids = [
+                    job_id for job_id in (raw_id.decode() for raw_id in self.redis.smembers('jobs'))
+                    if job_id not in self.training_jobs or self.training_jobs[job_id].status not in TERMINAL_STATUSES
+                ]
+            raw_jobs = self.redis.mget([f"job:{job_id}" for job_id in job_ids]) if job_ids else []
+        except Exception as e:
+            logger.error(f"Error reading jobs from Redis: {e}")
+            return
+        
+        for raw in raw_jobs:
+            job = self._parse_record(TrainingJob, raw) if raw else None
+            if job is None:
+                continue
+            local = self.training_jobs.get(job.id)
+            # Running here, or changed here and not yet flushed: keep the local record
+            if job.id in self._cancel_events or (local and self._job_bytes(local) is not self._redis_jobs.get(job.id)):
+                continue
+            # Seed the byte caches so a record read from Redis is not written back unchanged
+            self._job_bytes_cache[job.id] = (self._job_version(job), raw)
+            self._redis_jobs[job.id] = raw
+            self._add_job(job)
+    
+    def _refresh_models(self):
+        """Sync the model registry with Redis; only names not known locally are fetched"""
+        if not self.redis:
+            return
+        
+        try:
+            names = {raw_name.decode() for raw_name in self.redis.smembers('models')}
+            missing = [name for name in names if name not in self.trained_models]
+            raw_models = self.redis.mget([f"model:{name}" for name in missing]) if missing else []
+        except Exception as e:
+            logger.error(f"Error reading models from Redis: {e}")
+            return
+        
+        # ModelInfo is immutable once registered, so known names are kept as-is
+        models = {name: model for name, model in self.trained_models.items() if name in names}
+        for raw in raw_models:
+            model = self._parse_record(ModelInfo, raw) if raw else None
+            if model is not None:
+                self._model_bytes_cache[model.name] = (model, raw)
+                models[model.name] = model
+        self.trained_models = models
+    
+    def _acquire_slot(self, job_id: str) -> bool:
+        """Take a training slot: per process, and across workers when Redis is shared"""
+        if not self._job_slots.acquire(blocking=False):
+            return False
+        if self._slot_script:
+            now = time.time()
+            try:
+                acquired = self._slot_script(keys=[REDIS_ACTIVE_KEY],
+                                             args=[now, now + SLOT_LEASE, self.config.max_concurrent_jobs, job_id])
+            except Exception as e:
+                # Redis tidak terjangkau: batas per proses tetap berlaku
+                logger.error(f"Error acquiring Redis job slot: {e}")
+                acquired = True
+            if not acquired:
+                self._job_slots.release()
+                return False
+        return True
+    
+    def _release_slot(self, job_id: str):
+        """Give back the slot taken by _acquire_slot"""
+        self._job_slots.release()
+        if self.redis:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.zrem(REDIS_ACTIVE_KEY, job_id)
+                pipe.delete(f"cancel:{job_id}")
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Error releasing Redis job slot: {e}")
+    
+    def _heartbeat(self, job_id: str) -> bool:
+        """Renew the job's slot lease; True if another worker requested cancellation"""
+        if not self.redis:
+            return False
+        try:
+            pipe = self.redis.pipeline()
+            pipe.exists(f"cancel:{job_id}")
+            pipe.zadd(REDIS_ACTIVE_KEY, {job_id: time.time() + SLOT_LEASE}, xx=True)
+            cancelled, _ = pipe.execute()
+            return bool(cancelled)
+        except Exception as e:
+            logger.error(f"Error renewing job {job_id} lease: {e}")
+            return False
+    
+    def _save_to_redis(self):
+        """Write jobs changed since their last Redis write, one pipeline round-trip"""
+        changed = {}
+        for job in list(self.training_jobs.values()):
+            data = self._job_bytes(job)
+            if self._redis_jobs.get(job.id) is not data:
+                changed[job.id] = data
+        if not changed:
+            return
+        
+        pipe = self.redis.pipeline()
+        pipe.mset({f"job:{job_id}": data for job_id, data in changed.items()})
+        pipe.sadd('jobs', *changed)
+        pipe.execute()
+        self._redis_jobs.update(changed)
+    
+    def _register_model(self, model: ModelInfo):
+        """Add a trained model; written through to Redis so other workers see it"""
+        self.trained_models[model.name] = model
+        if self.redis:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.set(f"model:{model.name}", self._model_bytes(model))
+                pipe.sadd('models', model.name)
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Error saving model {model.name} to Redis: {e}")
+    
+    def _unregister_model(self, model_name: str):
+        """Remove a trained model locally and from Redis"""
+        self.trained_models.pop(model_name, None)
+        self._model_bytes_cache.pop(model_name, None)
+        if self.redis:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.srem('models', model_name)
+                pipe.delete(f"model:{model_name}")
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Error deleting model {model_name} from Redis: {e}")
+    
+    def _add_job(self, job: TrainingJob):
+        """Register a job and its entry in the start-time index"""
+        with self._job_seq_lock:
+            if job.id not in self.training_jobs:
+                self._jobs_by_time.add((-job.start_time, job.id))
+            self.training_jobs[job.id] = job
     
     def _load_state(self):
-        """Load existing training jobs and models from disk"""
+        """Load existing training jobs and models from Redis or disk"""
         try:
-            jobs_file = os.path.join(self.config.logs_directory, "training_jobs.json")
-            if os.path.exists(jobs_file):
-                with open(jobs_file, 'r') as f:
-                    jobs_data = json.load(f)
-                    for job_data in jobs_data:
-                        job = TrainingJob(**job_data)
-                        self.training_jobs[job.id] = job
-            
-            models_file = os.path.join(self.config.models_directory, "trained_models.json")
-            if os.path.exists(models_file):
-                with open(models_file, 'r') as f:
-                    models_data = json.load(f)
-                    for model_data in models_data:
-                        model = ModelInfo(**model_data)
-                        self.trained_models[model.name] = model
+            if self.redis:
+                self._refresh_jobs()
+                self._refresh_models()
+                if self.training_jobs or self.trained_models:
+                    return
+            
+            jobs_file = Path(self.config.logs_directory) / "training_jobs.json"
+            if jobs_file.exists():
+                for job_data in orjson.loads(jobs_file.read_bytes()):
+                    job = TrainingJob(**job_data)
+                    self._add_job(job)
+            
+            models_file = Path(self.config.models_directory) / "trained_models.json"
+            if models_file.exists():
+                for model_data in orjson.loads(models_file.read_bytes()):
+                    model = ModelInfo(**model_data)
+                    self.trained_models[model.name] = model
                         
         except Exception as e:
             logger.error(f"Error loading state: {e}")
     
+    def _job_bytes(self, job: TrainingJob) -> bytes:
+        """Serialized job, re-encoded only when one of its mutable fields changed"""
+        version = self._job_version(job)
+        cached = self._job_bytes_cache.get(job.id)
+        if cached and cached[0] == version:
+            return cached[1]
+        data = orjson.dumps(job)
+        self._job_bytes_cache[job.id] = (version, data)
+        return data
+    
+    @staticmethod
+    def _job_version(job: TrainingJob) -> tuple:
+        """Fields that change over a job's life; logs/metrics only grow"""
+        return (job.status, job.progress, len(job.logs), len(job.metrics),
+                job.end_time, job.error_message, job.model_path)
+    
+    def _model_bytes(self, model: ModelInfo) -> bytes:
+        """Serialized model info; ModelInfo is never mutated after registration"""
+        cached = self._model_bytes_cache.get(model.name)
+        if cached and cached[0] is model:
+            return cached[1]
+        data = orjson.dumps(model)
+        self._model_bytes_cache[model.name] = (model, data)
+        return data
+    
     def _save_state(self):
         """Save training jobs and models to disk"""
         try:
-            # Save training jobs
-            jobs_file = os.path.join(self.config.logs_directory, "training_jobs.json")
-            jobs_data = [asdict(job) for job in self.training_jobs.values()]
-            with open(jobs_file, 'w') as f:
-                json.dump(jobs_data, f, indent=2)
+            # Save training jobs, one cached record per line
+            jobs_file = Path(self.config.logs_directory) / "training_jobs.json"
+            jobs_file.write_bytes(_json_array([self._job_bytes(job) for job in list(self.training_jobs.values())]))
             
             # Save trained models
-            models_file = os.path.join(self.config.models_directory, "trained_models.json")
-            models_data = [asdict(model) for model in self.trained_models.values()]
-            with open(models_file, 'w') as f:
-                json.dump(models_data, f, indent=2)
+            models_file = Path(self.config.models_directory) / "trained_models.json"
+            models_file.write_bytes(_json_array([self._model_bytes(model) for model in list(self.trained_models.values())]))
+            
+            if self.redis:
+                self._save_to_redis()
                 
         except Exception as e:
             logger.error(f"Error saving state: {e}")
     
-    def validate_dataset(self, file_path: str) -> ValidationResponse:
+    def _mark_dirty(self):
+        """Schedule a state flush"""
+        self._dirty.set()
+    
+    def _state_writer(self):
+        """Background loop that writes dirty state at most once per STATE_FLUSH_DELAY"""
+        while True:
+            self._dirty.wait()
+            time.sleep(STATE_FLUSH_DELAY)
+            self._dirty.clear()
+            self._save_state()
+    
+    def _flush_state(self):
+        """Write pending state immediately (used on interpreter exit)"""
+        if self._dirty.is_set():
+            self._dirty.clear()
+            self._save_state()
+    
+    def _progress_consumer(self):
+        """Apply progress updates pushed by training workers"""
+        while True:
+            job_id, progress, log = self._progress_queue.get()
+            try:
+                job = self.training_jobs.get(job_id)
+                if job:
+                    job.progress = max(job.progress, progress)
+                    if log:
+                        job.logs.append(log)
+                    self._mark_dirty()
+                    if self.redis:
+                        self.redis.publish(REDIS_PROGRESS_CHANNEL, orjson.dumps({'job_id': job_id, 'progress': progress, 'log': log}))
+            except Exception as e:
+                logger.error(f"Error applying progress for job {job_id}: {e}")
+            finally:
+                self._progress_queue.task_done()
+    
+    @staticmethod
+    def _probe_dataset(file_path: str) -> Optional[DatasetProbe]:
+        """Stat a dataset once; None if it does not exist"""
+        if not file_path:
+            return None
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return DatasetProbe(
+            path=file_path,
+            size=st.st_size,
+            ext=os.path.splitext(file_path)[1].lower(),
+            basename=os.path.basename(file_path),
+            mtime_ns=st.st_mtime_ns
+        )
+    
+    def validate_dataset(self, file_path: str, probe: Optional[DatasetProbe] = None) -> ValidationResponse:
         """Validate uploaded dataset and return metadata"""
-        if not file_path or not os.path.exists(file_path):
+        if probe is None:
+            probe = self._probe_dataset(file_path)
+        if probe is None:
             # return False, "File does not exist", {}.
             return ValidationResponse(
                 status="error",
@@ -136,9 +512,23 @@ class ModelTrainerAPI:
                 metadata={}
             )
         
+        with self._validation_lock:
+            cached = self._validation_cache.get(probe.cache_key)
+            if cached is not None:
+                self._validation_cache.move_to_end(probe.cache_key)
+                return cached
+        
+        response = self._validate_probe(probe)
+        with self._validation_lock:
+            self._validation_cache[probe.cache_key] = response
+            if len(self._validation_cache) > VALIDATION_CACHE_SIZE:
+                self._validation_cache.popitem(last=False)
+        return response
+    
+    def _validate_probe(self, probe: DatasetProbe) -> ValidationResponse:
+        """Run size/format checks and analysis for a probed dataset"""
         try:
-            file_size = os.path.getsize(file_path)
-            if file_size > self.config.max_file_size:
+            if probe.size > self.config.max_file_size:
                 # return False, f"File too large. Max size: {self.config.max_file_size / 1024 / 1024:.1f}MB", {}
                 return ValidationResponse(
                 status="error",
@@ -146,8 +536,7 @@ class ModelTrainerAPI:
                 metadata={}
             )
             
-            file_ext = os.path.splitext(file_path)[1].lower()
-            if file_ext not in self.config.supported_formats:
+            if probe.ext not in self.config.supported_formats:
                 # return False, f"Unsupported format. Supported: {', '.join(self.config.supported_formats)}", {}
                 return ValidationResponse(
                     status="error",
@@ -156,7 +545,7 @@ class ModelTrainerAPI:
                 )
             
             # Analyze dataset
-            metadata = self._analyze_dataset(file_path, file_ext)
+            metadata = self._analyze_dataset(probe)
             
             return ValidationResponse(
                 status="success",
@@ -172,10 +561,15 @@ class ModelTrainerAPI:
                 metadata={}
             )
     
-    def _analyze_dataset(self, file_path: str, file_ext: str) -> Dict[str, Any]:
+    async def avalidate_dataset(self, file_path: str) -> ValidationResponse:
+        """validate_dataset off the event loop; stat and sampling reads run in a worker thread"""
+        return await asyncio.to_thread(self.validate_dataset, file_path)
+    
+    def _analyze_dataset(self, probe: DatasetProbe) -> Dict[str, Any]:
         """Analyze dataset and extract metadata"""
+        file_path, file_ext = probe.path, probe.ext
         metadata = {
-            'file_size': os.path.getsize(file_path),
+            'file_size': probe.size,
             'file_format': file_ext,
             'num_samples': 0,
             'columns': [],
@@ -184,45 +578,89 @@ class ModelTrainerAPI:
         
         try:
             if file_ext == '.csv':
-                df = pd.read_csv(file_path, nrows=1000)  # Sample first 1000 rows
-                metadata['num_samples'] = len(df)
-                metadata['columns'] = df.columns.tolist()
-                metadata['sample_data'] = df.head(3).to_dict('records')
+                try:
+                    import pyarrow.csv as pacsv
+                except ImportError:
+                    import pandas as pd
+                    df = pd.read_csv(file_path, nrows=3, engine='c')
+                    metadata['columns'] = df.columns.tolist()
+                    metadata['sample_data'] = df.to_dict('records')
+                else:
+                    # Only parse the first block; Arrow's reader never materializes the rest
+                    reader = pacsv.open_csv(file_path, read_options=pacsv.ReadOptions(block_size=1 << 16))
+                    batch = reader.read_next_batch()
+                    metadata['columns'] = batch.schema.names
+                    metadata['sample_data'] = batch.slice(0, 3).to_pylist()
+                # Header line is not a sample
+                metadata['num_samples'] = max(self._count_lines(file_path) - 1, 0)
                 
-            elif file_ext in ['.json', '.jsonl']:
-                with open(file_path, 'r') as f:
-                    if file_ext == '.json':
-                        data = json.load(f)
+            elif file_ext == '.json':
+                with open(file_path, 'rb') as f:
+                    try:
+                        import ijson
+                    except ImportError:
+                        data = orjson.loads(f.read())
                         if isinstance(data, list):
-                            metadata['num_samples'] = len(data)
+                            metadata['num_samples'] = min(len(data), MAX_SCAN_SAMPLES)
                             metadata['sample_data'] = data[:3]
-                    else:  # jsonl
-                        lines = f.readlines()[:1000]
-                        metadata['num_samples'] = len(lines)
+                    else:
+                        # Stream array items instead of loading the whole upload
+                        num_samples = 0
                         sample_data = []
-                        for line in lines[:3]:
-                            try:
-                                sample_data.append(json.loads(line.strip()))
-                            except:
-                                continue
+                        for item in ijson.items(f, 'item', use_float=True):
+                            num_samples += 1
+                            if len(sample_data) < 3:
+                                sample_data.append(item)
+                            if num_samples >= MAX_SCAN_SAMPLES:
+                                break
+                        metadata['num_samples'] = num_samples
                         metadata['sample_data'] = sample_data
                         
+            elif file_ext == '.jsonl':
+                sample_data = []
+                with open(file_path, 'rb') as f:
+                    for line in islice(f, 3):
+                        try:
+                            sample_data.append(orjson.loads(line))
+                        except orjson.JSONDecodeError:
+                            continue
+                metadata['sample_data'] = sample_data
+                metadata['num_samples'] = self._count_lines(file_path)
+                        
             elif file_ext == '.txt':
                 with open(file_path, 'r') as f:
-                    lines = f.readlines()
-                    metadata['num_samples'] = len(lines)
-                    metadata['sample_data'] = lines[:3]
+                    metadata['sample_data'] = list(islice(f, 3))
+                metadata['num_samples'] = self._count_lines(file_path)
                     
         except Exception as e:
             logger.error(f"Error analyzing dataset: {e}")
             
         return metadata
     
+    @staticmethod
+    def _count_lines(file_path: str) -> int:
+        """Count lines by scanning an mmap of the file in 1MB slices (bytes.count is memchr-backed)"""
+        with open(file_path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file cannot be mapped
+                return 0
+        try:
+            count = 0
+            for offset in range(0, len(mm), 1 << 20):
+                count += mm[offset:offset + (1 << 20)].count(b'\n')
+            # Final line without trailing newline still counts
+            return count + (mm[-1:] != b'\n')
+        finally:
+            mm.close()
+    
     def start_training(self, model_name: str, base_model: str, dataset_path: str,
                       learning_rate: float, batch_size: int, epochs: int,
                       max_length: int = 2048, description: str = "") -> ValidationResponse:
         """Start model training"""
         
+        self._refresh_models()
+        
         # Validate inputs
         if not model_name.strip():
             return "error", "Model name is required"
@@ -238,48 +676,65 @@ class ModelTrainerAPI:
             #     message=f"Model '{model_name}' already exists"
             # )    
         
-        if self.active_jobs >= self.config.max_concurrent_jobs:
+        # pid keeps ids unique across API workers sharing Redis
+        with self._job_seq_lock:
+            seq = next(self._job_seq)
+        job_id = f"job_{int(time.time())}_{os.getpid():x}_{seq:08x}"
+        
+        if not self._acquire_slot(job_id):
             return "error", f"Maximum concurrent jobs ({self.config.max_concurrent_jobs}) reached"
             # return ValidationResponse(
             #     status="error",
             #     message=f"Maximum concurrent jobs ({self.config.max_concurrent_jobs}) reached"
             # )
         
-        # Validate dataset
-        response = self.validate_dataset(dataset_path)
-        dataset_metadata = response.metadata
-        message = response.message
-        if response.status != "success":
-            return response.status, f"Dataset validation failed: {message}"
-            # return response.status, response.message
-        
-        # Create training job
-        job_id = f"job_{int(time.time())}_{len(self.training_jobs)}"
-        
-        job = TrainingJob(
-            id=job_id,
-            model_name=model_name,
-            base_model=base_model,
-            dataset_path=dataset_path,
-            status='pending',
-            progress=0,
-            learning_rate=learning_rate,
-            batch_size=batch_size,
-            epochs=epochs,
-            max_length=max_length,
-            start_time=datetime.now().isoformat()
-        )
-        
-        job.logs.append(f"Training job created at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        job.logs.append(f"Dataset: {os.path.basename(dataset_path)} ({dataset_metadata.get('num_samples', 0)} samples)")
-        
-        self.training_jobs[job_id] = job
-        self.active_jobs += 1
-        
-        # Start training (simulate async training)
-        self._simulate_training(job_id)
+        # Slot dilepas untuk kegagalan apa pun sebelum worker mengambil alih
+        try:
+            # Validate dataset
+            probe = self._probe_dataset(dataset_path)
+            response = self.validate_dataset(dataset_path, probe)
+            dataset_metadata = response.metadata
+            message = response.message
+            if response.status != "success":
+                self._release_slot(job_id)
+                return response.status, f"Dataset validation failed: {message}"
+                # return response.status, response.message
+            
+            # Create training job
+            job = TrainingJob(
+                id=job_id,
+                model_name=model_name,
+                base_model=base_model,
+                dataset_path=dataset_path,
+                status='pending',
+                progress=0,
+                learning_rate=learning_rate,
+                batch_size=batch_size,
+                epochs=epochs,
+                max_length=max_length,
+                start_time=time.time(),
+                dataset_name=probe.basename
+            )
+            
+            job.logs.append(f"Training job created at {_ts(job.start_time)}")
+            job.logs.append(f"Dataset: {probe.basename} ({dataset_metadata.get('num_samples', 0)} samples)")
+            
+            self._add_job(job)
+            self._cancel_events[job_id] = threading.Event()
+            
+            # Start training (simulate async training)
+            self._pool.submit(self._simulate_training, job_id)
+        except BaseException:
+            self._cancel_events.pop(job_id, None)
+            job = self.training_jobs.get(job_id)
+            if job:
+                job.status = 'failed'
+                job.error_message = "Job could not be started"
+                self._mark_dirty()
+            self._release_slot(job_id)
+            raise
         
-        self._save_state()
+        self._mark_dirty()
         
         return "success", f"Training started successfully! Job ID: {job_id}"
         # return ValidationResponse(
@@ -288,145 +743,171 @@ class ModelTrainerAPI:
         # )
     
     def _simulate_training(self, job_id: str):
-        """Simulate training process (replace with actual training logic)"""
-        def training_worker():
-            job = self.training_jobs.get(job_id)
-            if not job:
+        """Simulate training process (replace with actual training logic); runs on the trainer pool"""
+        job = self.training_jobs[job_id]
+        cancel_event = self._cancel_events[job_id]
+        
+        try:
+            # Cancelled while still queued in the pool
+            if cancel_event.is_set() or self._heartbeat(job_id):
+                self._mark_cancelled(job)
                 return
             
-            try:
-                job.status = 'training'
-                job.logs.append("Training started...")
-                
-                # Simulate training progress
-                for epoch in range(job.epochs):
-                    for step in range(10):  # 10 steps per epoch
-                        if job.status == 'cancelled':
-                            return
-                        
-                        time.sleep(0.5)  # Simulate training time
-                        progress = ((epoch * 10 + step + 1) / (job.epochs * 10)) * 100
-                        job.progress = int(progress)
-                        
-                        if step % 3 == 0:  # Log every 3 steps
-                            job.logs.append(f"Epoch {epoch + 1}/{job.epochs}, Step {step + 1}/10 - Loss: {0.5 - progress/200:.4f}")
-                
-                # Complete training
+            job.status = 'training'
+            job.logs.append("Training started...")
+            
+            # Simulate training progress
+            for epoch in range(job.epochs):
+                for step in range(10):  # 10 steps per epoch
+                    # Simulate training time; wakes immediately on a local cancel,
+                    # a cancel from another worker is seen at the next heartbeat
+                    if cancel_event.wait(timeout=STEP_DURATION) or self._heartbeat(job_id):
+                        self._mark_cancelled(job)
+                        return
+                    
+                    progress = ((epoch * 10 + step + 1) / (job.epochs * 10)) * 100
+                    log = None
+                    if step % 3 == 0:  # Log every 3 steps
+                        log = f"Epoch {epoch + 1}/{job.epochs}, Step {step + 1}/10 - Loss: {0.5 - progress/200:.4f}"
+                    self._progress_queue.put((job_id, int(progress), log))
+            
+            # Let pending step logs land before the completion entries
+            self._progress_queue.join()
+            
+            # Complete training, unless a cancel landed after the last step
+            with self._status_lock:
+                if cancel_event.is_set() or job.status == 'cancelled' or self._heartbeat(job_id):
+                    self._mark_cancelled(job)
+                    return
                 job.status = 'completed'
-                job.end_time = datetime.now().isoformat()
-                job.progress = 100
-                job.logs.append("Training completed successfully!")
-                
-                # Create model info
-                model_path = os.path.join(self.config.models_directory, f"{job.model_name}.model")
-                
-                model_info = ModelInfo(
-                    name=job.model_name,
-                    base_model=job.base_model,
-                    model_path=model_path,
-                    training_job_id=job_id,
-                    created_at=job.end_time,
-                    dataset_info={'path': job.dataset_path, 'samples': 1000},
-                    performance_metrics={'accuracy': 0.95, 'loss': 0.05},
-                    model_size=1024 * 1024 * 50,  # 50MB
-                    description=f"Custom model trained on {os.path.basename(job.dataset_path)}"
-                )
-                
-                self.trained_models[job.model_name] = model_info
-                
-                # Simulate saving model file
-                with open(model_path, 'w') as f:
-                    f.write(f"Model: {job.model_name}\nTrained: {job.end_time}")
-                
-            except Exception as e:
-                job.status = 'failed'
-                job.error_message = str(e)
-                job.logs.append(f"Training failed: {str(e)}")
-                logger.error(f"Training failed for job {job_id}: {e}")
+            job.end_time = time.time()
+            job.progress = 100
+            job.logs.append("Training completed successfully!")
             
-            finally:
-                self.active_jobs -= 1
-                self._save_state()
+            # Create model info
+            model_path = os.path.join(self.config.models_directory, f"{job.model_name}.model")
+            
+            model_info = ModelInfo(
+                name=job.model_name,
+                base_model=job.base_model,
+                model_path=model_path,
+                training_job_id=job_id,
+                created_at=datetime.fromtimestamp(job.end_time).isoformat(),
+                dataset_info={'path': job.dataset_path, 'samples': 1000},
+                performance_metrics={'accuracy': 0.95, 'loss': 0.05},
+                model_size=1024 * 1024 * 50,  # 50MB
+                description=f"Custom model trained on {job.dataset_name}"
+            )
+            
+            self._register_model(model_info)
+            
+            # Simulate saving model file
+            with open(model_path, 'w') as f:
+                f.write(f"Model: {job.model_name}\nTrained: {_ts(job.end_time)}")
+            
+        except Exception as e:
+            job.status = 'failed'
+            job.error_message = str(e)
+            job.logs.append(f"Training failed: {str(e)}")
+            logger.error(f"Training failed for job {job_id}: {e}")
         
-        # Start training in background (in real implementation, use proper async/threading)
-        import threading
-        thread = threading.Thread(target=training_worker)
-        thread.daemon = True
-        thread.start()
+        finally:
+            self._cancel_events.pop(job_id, None)
+            self._release_slot(job_id)
+            self._mark_dirty()
+    
+    @staticmethod
+    def _mark_cancelled(job: TrainingJob):
+        """Final state for a job stopped by cancel_training (possibly on another worker)"""
+        if job.status != 'cancelled':
+            job.status = 'cancelled'
+            job.logs.append(f"Training cancelled at {_ts()}")
     
     def get_training_status(self, job_id: Optional[str] = None) -> str:
         """Get training status for specific job or all jobs"""
+        self._refresh_jobs([job_id] if job_id else None)
         if job_id:
             job = self.training_jobs.get(job_id)
             if not job:
                 return f"Job {job_id} not found"
             
-            status_text = f"**Job {job_id} Status:**\n\n"
-            status_text += f"Model: {job.model_name}\n"
-            status_text += f"Status: {job.status.title()}\n"
-            status_text += f"Progress: {job.progress}%\n"
-            status_text += f"Base Model: {job.base_model}\n"
-            status_text += f"Started: {job.start_time[:19]}\n"
+            parts = [
+                f"**Job {job_id} Status:**\n\n"
+                f"Model: {job.model_name}\n"
+                f"Status: {job.status.title()}\n"
+                f"Progress: {job.progress}%\n"
+                f"Base Model: {job.base_model}\n"
+                f"Started: {_ts(job.start_time)}\n"
+            ]
             
             if job.end_time:
-                status_text += f"Completed: {job.end_time[:19]}\n"
+                parts.append(f"Completed: {_ts(job.end_time)}\n")
             
             if job.error_message:
-                status_text += f"Error: {job.error_message}\n"
+                parts.append(f"Error: {job.error_message}\n")
             
             if job.logs:
-                status_text += f"\n**Recent Logs:**\n"
-                for log in job.logs[-5:]:  # Show last 5 logs
-                    status_text += f"- {log}\n"
+                parts.append("\n**Recent Logs:**\n")
+                parts.extend(f"- {log}\n" for log in job.logs[-5:])  # Show last 5 logs
             
-            return status_text
+            return "".join(parts)
         
         # Return all jobs status
         if not self.training_jobs:
             return "No training jobs found"
         
-        status_text = "**All Training Jobs:**\n\n"
+        parts = ["**All Training Jobs:**\n\n"]
+        
+        with self._job_seq_lock:
+            ordered_ids = [jid for _, jid in self._jobs_by_time]
         
-        for job in sorted(self.training_jobs.values(), key=lambda x: x.start_time, reverse=True):
-            status_text += f"**{job.model_name}** (ID: {job.id})\n"
-            status_text += f"- Status: {job.status.title()}\n"
-            status_text += f"- Progress: {job.progress}%\n"
-            status_text += f"- Base Model: {job.base_model}\n"
-            status_text += f"- Started: {job.start_time[:19]}\n"
+        for jid in ordered_ids:
+            job = self.training_jobs[jid]
+            parts.append(
+                f"**{job.model_name}** (ID: {job.id})\n"
+                f"- Status: {job.status.title()}\n"
+                f"- Progress: {job.progress}%\n"
+                f"- Base Model: {job.base_model}\n"
+                f"- Started: {_ts(job.start_time)}\n"
+            )
             
             if job.logs:
-                status_text += f"- Latest: {job.logs[-1]}\n"
+                parts.append(f"- Latest: {job.logs[-1]}\n")
             
-            status_text += "\n"
+            parts.append("\n")
         
-        return status_text
+        return "".join(parts)
     
     def get_trained_models(self) -> str:
         """Get list of all trained models"""
+        self._refresh_models()
         if not self.trained_models:
             return "No trained models available"
         
-        models_text = "**Trained Models:**\n\n"
+        parts = ["**Trained Models:**\n\n"]
         
         for model in sorted(self.trained_models.values(), key=lambda x: x.created_at, reverse=True):
-            models_text += f"**{model.name}**\n"
-            models_text += f"- Base Model: {model.base_model}\n"
-            models_text += f"- Created: {model.created_at[:19]}\n"
-            models_text += f"- Size: {model.model_size / 1024 / 1024:.1f} MB\n"
-            models_text += f"- Dataset: {os.path.basename(model.dataset_info.get('path', 'Unknown'))}\n"
+            parts.append(
+                f"**{model.name}**\n"
+                f"- Base Model: {model.base_model}\n"
+                f"- Created: {model.created_at[:19]}\n"
+                f"- Size: {model.model_size / 1024 / 1024:.1f} MB\n"
+                f"- Dataset: {os.path.basename(model.dataset_info.get('path', 'Unknown'))}\n"
+            )
             
             if model.performance_metrics:
-                models_text += f"- Accuracy: {model.performance_metrics.get('accuracy', 0):.2%}\n"
+                parts.append(f"- Accuracy: {model.performance_metrics.get('accuracy', 0):.2%}\n")
             
             if model.description:
-                models_text += f"- Description: {model.description}\n"
+                parts.append(f"- Description: {model.description}\n")
             
-            models_text += "\n"
+            parts.append("\n")
         
-        return models_text
+        return "".join(parts)
     
     def test_model(self, model_name: str, test_input: str) -> str:
         """Test a trained model with input"""
+        self._refresh_models()
         if not model_name or not test_input:
             return "Please provide both model name and test input"
         
@@ -438,14 +919,8 @@ class ModelTrainerAPI:
             return f"Model file not found at {model.model_path}"
         
         # Simulate model inference
-        response_templates = [
-            f"Based on my training with {model.base_model}, here's my response to '{test_input}': This is a simulated response that would be generated by your custom trained model.",
-            f"Using the patterns learned from your dataset, I interpret '{test_input}' as follows: [Simulated model output based on training data]",
-            f"Model '{model_name}' response: Your trained model would process this input and generate contextually appropriate output based on the training data."
-        ]
-        
-        import random
-        response = random.choice(response_templates)
+        template = _RESPONSE_TEMPLATES[random.randrange(len(_RESPONSE_TEMPLATES))]
+        response = template.format(base=model.base_model, name=model_name, input=test_input)
         
         result = f"**Model Response from '{model_name}':**\n\n"
         result += f"**Input:** {test_input}\n\n"
@@ -459,6 +934,7 @@ class ModelTrainerAPI:
     
     def cancel_training(self, job_id: str) -> ValidationResponse:
         """Cancel a training job"""
+        self._refresh_jobs([job_id])
         job = self.training_jobs.get(job_id)
         if not job:
             # return False, f"Job {job_id} not found"
@@ -467,17 +943,27 @@ class ModelTrainerAPI:
                 message=f"Job {job_id} not found"
             )
         
-        if job.status not in ['pending', 'training']:
-            # return False, f"Cannot cancel job with status: {job.status}"
-            return ValidationResponse(
-                status="error",
-                message=f"Cannot cancel job with status: {job.status}"
-            )
+        with self._status_lock:
+            if job.status not in ['pending', 'training']:
+                # return False, f"Cannot cancel job with status: {job.status}"
+                return ValidationResponse(
+                    status="error",
+                    message=f"Cannot cancel job with status: {job.status}"
+                )
+            
+            self._mark_cancelled(job)
+            cancel_event = self._cancel_events.get(job_id)
+            if cancel_event:
+                cancel_event.set()
         
-        job.status = 'cancelled'
-        job.logs.append(f"Training cancelled at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        if not cancel_event and self.redis:
+            # Job runs in another worker; it polls this key every step
+            try:
+                self.redis.set(f"cancel:{job_id}", 1, ex=CANCEL_KEY_TTL)
+            except Exception as e:
+                logger.error(f"Error sending cancel for job {job_id}: {e}")
         
-        self._save_state()
+        self._mark_dirty()
         
         # return True, f"Training job {job_id} cancelled successfully"
         return ValidationResponse(
@@ -487,6 +973,7 @@ class ModelTrainerAPI:
     
     def delete_model(self, model_name: str) -> ValidationResponse:
         """Delete a trained model"""
+        self._refresh_models()
         model = self.trained_models.get(model_name)
         if not model:
             # return False, f"Model '{model_name}' not found"
@@ -501,9 +988,9 @@ class ModelTrainerAPI:
                 os.remove(model.model_path)
             
             # Remove from registry
-            del self.trained_models[model_name]
+            self._unregister_model(model_name)
             
-            self._save_state()
+            self._mark_dirty()
             
             # return True, f"Model '{model_name}' deleted successfully"
             return ValidationResponse(
@@ -520,22 +1007,42 @@ class ModelTrainerAPI:
     
     def export_model(self, model_name: str, export_format: str = 'zip') -> ValidationResponse:
         """Export a trained model"""
+        self._refresh_models()
         model = self.trained_models.get(model_name)
         if not model:
             # return False, f"Model '{model_name}' not found"
             return ValidationResponse(
-                success="error",
+                status="error",
                 message=f"Model '{model_name}' not found"
             )
         
+        if export_format not in ('zip', 'tar'):
+            return ValidationResponse(
+                status="error",
+                message=f"Unsupported export format: {export_format}"
+            )
+        
         try:
             export_path = os.path.join(self.config.models_directory, f"{model_name}_export.{export_format}")
+            meta = orjson.dumps(
+                {**asdict(model), 'exported_at': datetime.now().isoformat()},
+                option=orjson.OPT_INDENT_2
+            )
+            arcname = os.path.basename(model.model_path)
             
-            # Simulate export process
-            with open(export_path, 'w') as f:
-                f.write(f"Exported model: {model_name}\n")
-                f.write(f"Export time: {datetime.now().isoformat()}\n")
-                f.write(f"Model info: {json.dumps(asdict(model), indent=2)}\n")
+            if export_format == 'zip':
+                # Weights are already dense, deflating them costs CPU for little gain
+                with zipfile.ZipFile(export_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+                    archive.write(model.model_path, arcname=arcname)
+                    archive.writestr('meta.json', meta)
+            else:
+                # Stream mode writes each member sequentially without seeking back
+                with tarfile.open(export_path, mode='w|', bufsize=1 << 20) as archive:
+                    archive.add(model.model_path, arcname=arcname)
+                    info = tarfile.TarInfo('meta.json')
+                    info.size = len(meta)
+                    info.mtime = int(time.time())
+                    archive.addfile(info, io.BytesIO(meta))
             
             # return True, f"Model exported to: {export_path}"
             return ValidationResponse(
@@ -546,6 +1053,10 @@ class ModelTrainerAPI:
         except Exception as e:
             # return False, f"Export failed: {str(e)}"
             return ValidationResponse(
-                status="success",
+                status="error",
                 message=f"Export failed: {str(e)}"
-            )
\ No newline at end of file
+            )
+    
+    async def aexport_model(self, model_name: str, export_format: str = 'zip') -> ValidationResponse:
+        """export_model off the event loop"""
+        return await asyncio.to_thread(self.export_model, model_name, export_format)
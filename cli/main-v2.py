@@ -2,7 +2,6 @@
 Command Line Interface for CVE Analyst System
 """
 import argparse
-import asyncio
 import sys
 from pathlib import Path
 
@@ -18,14 +17,9 @@ from config.settings import ModelTrainerConfig
 # from api.cve_analyst_api import CVEAnalystAPI
 
 # from api.fastapi_app import create_fastapi_app
-from api.gradio_app import create_gradio_interface
 # from scheduler.cve_scheduler import CVEScheduler
 from utils.logging_config import setup_logging
 
-import uvicorn
-from uvicorn.config import Config
-from uvicorn.server import Server
-
 
 def create_cli():
     """Create command line interface"""
@@ -60,7 +54,7 @@ def create_cli():
     
     return parser
 
-async def main():
+def main():
     """Main function"""
     setup_logging()
     
@@ -68,13 +62,14 @@ async def main():
     args = parser.parse_args()
     
     # Create config
-    config = ModelTrainerConfig
+    config = ModelTrainerConfig.from_env()
     # if hasattr(args, 'model'):
     #     config.model_name = args.model
     # if hasattr(args, 'nvd_api_key') and args.nvd_api_key:
     #     config.nvd_api_key = args.nvd_api_key
     
     if args.command == 'api':
+        from api.gradio_app import create_gradio_interface
         interface = create_gradio_interface(config)
         print(f"Starting Gradio interface on port {args.port}")
         interface.launch(server_name="0.0.0.0", server_port=args.port, share=False)
@@ -82,4 +77,4 @@ async def main():
         parser.print_help()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -3,7 +3,12 @@ Command Line Interface for CVE Analyst System
 """
 import argparse
 import asyncio
+import dataclasses
+import os
+import queue
 import sys
+from importlib.util import find_spec
+from itertools import islice
 from pathlib import Path
 
 # Add parent directory to path for imports
@@ -12,157 +17,255 @@ sys.path.append(str(Path(__file__).parent.parent))
 from config.settings import CVEConfig
 from config.settings import ModelTrainerConfig
 
-from scrapers.cve_scraper import CVEScraper
-from data.dataset_generator import DatasetGenerator
-from training.model_trainer import CVEModelTrainer
-from api.cve_analyst_api import CVEAnalystAPI
-
-from api.fastapi_app import create_fastapi_app
-from api.gradio_app import create_gradio_interface
-from scheduler.cve_scheduler import CVEScheduler
 from utils.logging_config import setup_logging
 
-import uvicorn
-from uvicorn.config import Config
-from uvicorn.server import Server
+# Heavy modules (torch/transformers, uvicorn, gradio, scrapers) are imported
+# inside the command handlers that need them so `--help` stays fast
 
+try:
+    import uvloop
+except ImportError:  # e.g. Windows; fall back to the stdlib event loop
+    uvloop = None
 
-def create_cli():
-    """Create command line interface"""
-    parser = argparse.ArgumentParser(description="CVE Analyst LLM System")
-    subparsers = parser.add_subparsers(dest='command', help='Available commands')
-    
-    # Setup command
-    setup_parser = subparsers.add_parser('setup', help='Initialize system')
-    setup_parser.add_argument('--model', default='deepseek-ai/deepseek-coder-1.3b-instruct', help='Model name')
-    setup_parser.add_argument('--nvd-api-key', help='NVD API Key')
-    
-    # Scrape command
-    scrape_parser = subparsers.add_parser('scrape', help='Scrape CVE data')
-    scrape_parser.add_argument('--days', type=int, default=7, help='Days back to scrape')
-    
-    # Train command
-    train_parser = subparsers.add_parser('train', help='Train model')
-    train_parser.add_argument('--dataset', help='Dataset file path')
-    
-    # API command
-    api_parser = subparsers.add_parser('api', help='Start API server')
-    api_parser.add_argument('--port', type=int, default=8000, help='Port number')
-    api_parser.add_argument('--interface', choices=['fastapi', 'gradio'], default='fastapi', help='Interface type')
-    
-    # Schedule command
-    schedule_parser = subparsers.add_parser('schedule', help='Start scheduler')
-    
-    # Analyze command
-    analyze_parser = subparsers.add_parser('analyze', help='Analyze CVE')
-    analyze_parser.add_argument('cve_id', help='CVE ID to analyze')
-    analyze_parser.add_argument('--instruction', default='Analyze this CVE', help='Analysis instruction')
-    
-    return parser
+# Jumlah CVE di dataset awal setup (sama dengan limit=1000 pada generate_training_dataset)
+SETUP_DATASET_CVES = 1000
 
-async def main():
-    """Main function"""
-    setup_logging()
-    
-    parser = create_cli()
-    args = parser.parse_args()
-    
-    # Create CVE config
-    config = CVEConfig.from_env()
-    if hasattr(args, 'model'):
-        config.model_name = args.model
-    if hasattr(args, 'nvd_api_key') and args.nvd_api_key:
-        config.nvd_api_key = args.nvd_api_key
-    
+# Loop implementation shared by asyncio.run and uvicorn
+LOOP_IMPL = "uvloop" if uvloop else "asyncio"
+# HTTP parser: httptools (C) bila terpasang, selain itu h11 bawaan uvicorn
+HTTP_IMPL = "httptools" if find_spec("httptools") else "h11"
+
+
+async def _cmd_setup(args, config: CVEConfig):
+    """Scrape initial data and build the first training dataset"""
+    from scrapers.cve_scraper import CVEScraper
+    from data.dataset_generator import DatasetGenerator
+
+    config = dataclasses.replace(config, model_name=args.model)
+    if args.nvd_api_key:
+        config = dataclasses.replace(config, nvd_api_key=args.nvd_api_key)
+
+    print("Setting up CVE Analyst System...")
+
+    # Initialize scrapers and generate initial dataset
+    scraper = CVEScraper(config)
+    dataset_generator = DatasetGenerator(config)
+
+    # Scrape initial data and generate the dataset as CVEs arrive
+    print("Scraping initial CVE data and generating training dataset...")
+    scraped = queue.Queue()
+    # CVE yang masuk dataset (maks SETUP_DATASET_CVES), untuk koreksi flag exploit
+    included = []
+
+    def _scraped_cves():
+        while (cve := scraped.get()) is not None:
+            included.append(cve)
+            yield cve
+
+    async def _scrape_nvd():
+        try:
+            await scraper.scrape_nvd_cves(days_back=30, sink=scraped)
+        finally:
+            scraped.put(None)
+
+    # Exploit-DB dan penulisan dataset jalan di thread, NVD di event loop
+    await asyncio.gather(
+        asyncio.to_thread(scraper.scrape_exploit_db),
+        asyncio.to_thread(dataset_generator.save_dataset,
+                          dataset_generator.iter_instruction_samples(islice(_scraped_cves(), SETUP_DATASET_CVES)),
+                          "initial_dataset.json"),
+        _scrape_nvd(),
+    )
+    await asyncio.to_thread(dataset_generator.db.mark_exploited_cves)
+
+    # Exploit-DB biasanya selesai setelah sampel ditulis (exploit_available=0);
+    # tulis ulang dari CVE yang sama bila ada yang ternyata punya exploit
+    exploited = await asyncio.to_thread(dataset_generator.db.exploited_cve_ids)
+    if any(cve['cve_id'] in exploited for cve in included):
+        flagged = ({**cve, 'exploit_available': int(cve['cve_id'] in exploited)} for cve in included)
+        await asyncio.to_thread(dataset_generator.save_dataset,
+                                dataset_generator.iter_instruction_samples(flagged),
+                                "initial_dataset.json")
+
+    print("Setup completed successfully!")
+
+async def _cmd_scrape(args, config: CVEConfig):
+    """Scrape recent CVE data"""
+    from scrapers.cve_scraper import CVEScraper
+
+    scraper = CVEScraper(config)
+    print(f"Scraping CVE data for last {args.days} days...")
+    await asyncio.gather(
+        asyncio.to_thread(scraper.scrape_exploit_db),
+        scraper.scrape_nvd_cves(days_back=args.days),
+    )
+    await asyncio.to_thread(scraper.db.mark_exploited_cves)
+    print("Scraping completed!")
+
+async def _cmd_train(args, config: CVEConfig):
+    """Train the model on a dataset file or a freshly generated dataset"""
+    from training.model_trainer import CVEModelTrainer
+    from data.dataset_generator import DatasetGenerator
+
+    trainer = CVEModelTrainer(config)
+    dataset_generator = DatasetGenerator(config)
+
+    if args.dataset:
+        dataset = trainer.load_dataset_from_file(args.dataset)
+    else:
+        dataset = dataset_generator.generate_instruction_dataset()
+
+    print("Starting model training...")
+    trainer.train_model(dataset)
+    print("Training completed!")
+
+async def _serve_fastapi(app, port: int):
+    """Serve an ASGI app with uvicorn on the current event loop"""
+    from uvicorn.config import Config
+    from uvicorn.server import Server
+
+    # Access log dimatikan (format + IO per request)
+    server = Server(Config(app=app, host="0.0.0.0", port=port, loop=LOOP_IMPL,
+                           http=HTTP_IMPL, access_log=False))
+    await server.serve()
+
+async def _serve(args, config, share: bool):
+    """Start the FastAPI or Gradio frontend for the given config"""
+    if args.interface == 'fastapi':
+        print(f"Starting FastAPI server on port {args.port}")
+        from api.fastapi_app import create_fastapi_app
+
+        await _serve_fastapi(create_fastapi_app(config), args.port)
+    else:
+        from api.gradio_app import create_gradio_interface
+
+        interface = create_gradio_interface(config)
+        print(f"Starting Gradio interface on port {args.port}")
+        interface.launch(server_name="0.0.0.0", server_port=args.port, share=share)
+
+def _serve_workers(args):
+    """Multi-process uvicorn; the supervisor must start outside a running event loop"""
+    import uvicorn
+
+    print(f"Starting FastAPI server on port {args.port} with {args.workers} workers")
+    # Tiap worker memuat model sendiri, config dari env
+    uvicorn.run("api.fastapi_app:app_factory", factory=True, host="0.0.0.0", port=args.port,
+                workers=args.workers, loop=LOOP_IMPL, http=HTTP_IMPL, access_log=False)
+
+async def _cmd_api_cve(args, config: CVEConfig):
+    """Serve the CVE analyst over FastAPI or Gradio"""
+    await _serve(args, config, share=False)
+
+async def _cmd_api(args, config: CVEConfig):
+    """Serve the model trainer over FastAPI or Gradio"""
     # Load ModelTrainerConfig if provided
     # trainer_config = None
     # if args.trainer_config:
         # trainer_config = ModelTrainerConfig.from_file(args.trainer_config)
     trainer_config = ModelTrainerConfig.from_env()
+    await _serve(args, trainer_config, share=True)
 
-    if args.command == 'setup':
-        print("Setting up CVE Analyst System...")
-        
-        # Initialize scrapers and generate initial dataset
-        scraper = CVEScraper(config)
-        dataset_generator = DatasetGenerator(config)
-        
-        # Scrape initial data
-        print("Scraping initial CVE data...")
-        await scraper.scrape_nvd_cves(days_back=30)
-        scraper.scrape_exploit_db()
-        
-        # Generate dataset
-        print("Generating training dataset...")
-        dataset = dataset_generator.generate_instruction_dataset()
-        dataset_generator.save_dataset(dataset, "initial_dataset.json")
-        
-        print("Setup completed successfully!")
-    
-    elif args.command == 'scrape':
-        scraper = CVEScraper(config)
-        print(f"Scraping CVE data for last {args.days} days...")
-        await scraper.scrape_nvd_cves(days_back=args.days)
-        scraper.scrape_exploit_db()
-        print("Scraping completed!")
-    
-    elif args.command == 'train':
-        trainer = CVEModelTrainer(config)
-        dataset_generator = DatasetGenerator(config)
-        
-        if args.dataset:
-            dataset = trainer.load_dataset_from_file(args.dataset)
-        else:
-            dataset = dataset_generator.generate_instruction_dataset()
-        
-        print("Starting model training...")
-        trainer.train_model(dataset)
-        print("Training completed!")
-
-    elif args.command == 'api-cve':
-        if args.interface == 'fastapi':
-            
-            app = create_fastapi_app(config)
-            print(f"Starting FastAPI server on port {args.port}")
-            config = Config(app=app, host="0.0.0.0", port=args.port)
-            server = Server(config)
-            await server.serve()
-            # uvicorn.run(app, host="0.0.0.0", port=args.port)
-        else:
-            interface = create_gradio_interface(config)
-            print(f"Starting Gradio interface on port {args.port}")
-            interface.launch(server_name="0.0.0.0", server_port=args.port, share=False)
-
-    elif args.command == 'api':
-        if args.interface == 'fastapi':
-            
-            app = create_fastapi_app(trainer_config)
-            print(f"Starting FastAPI server on port {args.port}")
-            config = Config(app=app, host="0.0.0.0", port=args.port)
-            server = Server(config)
-            await server.serve()
-            # uvicorn.run(app, host="0.0.0.0", port=args.port)
-        else:
-            interface = create_gradio_interface(trainer_config)
-            print(f"Starting Gradio interface on port {args.port}")
-            interface.launch(server_name="0.0.0.0", server_port=args.port, share=True)
-    
-    elif args.command == 'schedule':
-        scheduler = CVEScheduler(config)
-        print("Starting background scheduler...")
-        scheduler.start_scheduler()
-    
-    elif args.command == 'analyze':
-        api = CVEAnalystAPI(config)
-        print(f"Analyzing {args.cve_id}...")
-        result = api.analyze_cve(args.cve_id, args.instruction)
-        print("\n" + "="*50)
-        print("ANALYSIS RESULT:")
-        print("="*50)
-        print(result)
-    
-    else:
+async def _cmd_schedule(args, config: CVEConfig):
+    """Run the background update scheduler"""
+    from scheduler.cve_scheduler import CVEScheduler
+
+    scheduler = CVEScheduler(config)
+    print("Starting background scheduler...")
+    await scheduler.start_scheduler()
+
+async def _cmd_analyze(args, config: CVEConfig):
+    """Analyze a single CVE and print the result"""
+    from api.cve_analyst_api import CVEAnalystAPI
+
+    api = CVEAnalystAPI(config)
+    print(f"Analyzing {args.cve_id}...")
+    result = api.analyze_cve(args.cve_id, args.instruction)
+    print("\n" + "="*50)
+    print("ANALYSIS RESULT:")
+    print("="*50)
+    print(result)
+
+
+def _add_setup_args(p):
+    p.add_argument('--model', default='deepseek-ai/deepseek-coder-1.3b-instruct', help='Model name')
+    p.add_argument('--nvd-api-key', help='NVD API Key')
+
+def _add_scrape_args(p):
+    p.add_argument('--days', type=int, default=7, help='Days back to scrape')
+
+def _add_train_args(p):
+    p.add_argument('--dataset', help='Dataset file path')
+
+def _add_serve_args(p):
+    p.add_argument('--port', type=int, default=8000, help='Port number')
+    p.add_argument('--interface', choices=['fastapi', 'gradio'], default='fastapi', help='Interface type')
+    # GPU-backed model: tetap 1 worker kecuali VRAM cukup untuk beberapa salinan
+    p.add_argument('--workers', type=int, default=1,
+                   help='Uvicorn worker processes (api-cve with FastAPI only)')
+
+def _add_api_cve_args(p):
+    _add_serve_args(p)
+    # UVICORN_WORKERS hanya berlaku untuk api-cve, satu-satunya yang punya app factory
+    p.set_defaults(workers=int(os.getenv('UVICORN_WORKERS', '1')))
+
+def _add_analyze_args(p):
+    p.add_argument('cve_id', help='CVE ID to analyze')
+    p.add_argument('--instruction', default='Analyze this CVE', help='Analysis instruction')
+
+# name -> (help, argument builder, handler); urutan = urutan di --help
+COMMANDS = {
+    'setup': ('Initialize system', _add_setup_args, _cmd_setup),
+    'scrape': ('Scrape CVE data', _add_scrape_args, _cmd_scrape),
+    'train': ('Train model', _add_train_args, _cmd_train),
+    'api': ('Start API server', _add_serve_args, _cmd_api),
+    'api-cve': ('Start CVE analyst API server', _add_api_cve_args, _cmd_api_cve),
+    'schedule': ('Start scheduler', None, _cmd_schedule),
+    'analyze': ('Analyze CVE', _add_analyze_args, _cmd_analyze),
+}
+
+def create_cli(argv=None):
+    """Create command line interface; only the invoked subcommand gets its arguments"""
+    if argv is None:
+        argv = sys.argv[1:]
+    selected = next((a for a in argv if not a.startswith('-')), None)
+
+    parser = argparse.ArgumentParser(description="CVE Analyst LLM System")
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+
+    for name, (help_text, add_args, handler) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text)
+        # Subcommand lain cukup nama + help untuk listing di --help
+        if name == selected:
+            if add_args:
+                add_args(sub)
+            sub.set_defaults(func=handler)
+
+    return parser
+
+def main():
+    """Main function"""
+    setup_logging()
+
+    argv = sys.argv[1:]
+    parser = create_cli(argv)
+    args = parser.parse_args(argv)
+
+    if not hasattr(args, 'func'):
         parser.print_help()
+        return
+
+    # Multi-worker FastAPI dijalankan sebelum event loop dibuat
+    if getattr(args, 'workers', 1) > 1 and args.interface == 'fastapi':
+        if args.command != 'api-cve':
+            parser.error("--workers > 1 is only supported for api-cve")
+        _serve_workers(args)
+        return
+
+    # Create CVE config; commands apply their own overrides
+    config = CVEConfig.from_env()
+    if uvloop:
+        uvloop.install()
+    asyncio.run(args.func(args, config))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -2,13 +2,20 @@
 Configuration module for CVE Analyst System
 """
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Tuple
 
 
-@dataclass
+@lru_cache(maxsize=None)
+def _ensure_dirs(paths: Tuple[Path, ...]) -> None:
+    """Create directories once per process; repeat configs with the same paths skip the syscalls"""
+    for path in paths:
+        path.mkdir(exist_ok=True, parents=True)
+
+
+@dataclass(frozen=True)
 class CVEConfig:
     """Konfigurasi sistem CVE Analyst"""
     # Data Sources
@@ -22,6 +29,9 @@ class CVEConfig:
     max_length: int = 2048
     batch_size: int = 4
     learning_rate: float = 2e-4
+    gradient_accumulation_steps: int = 8
+    quantization: str = "none"  # none, int8, nf4, awq
+    compile_model: bool = True
     
     # Paths
     data_dir: Path = Path("./cve_data")
@@ -32,8 +42,11 @@ class CVEConfig:
     update_interval_hours: int = 6
     
     def __post_init__(self):
-        for path in [self.data_dir, self.model_dir, self.logs_dir]:
-            path.mkdir(exist_ok=True, parents=True)
+        self.ensure_dirs()
+
+    def ensure_dirs(self):
+        """Pastikan direktori data, model, dan log tersedia"""
+        _ensure_dirs((self.data_dir, self.model_dir, self.logs_dir))
 
     @classmethod
     def from_env(cls) -> 'CVEConfig':
@@ -44,19 +57,28 @@ class CVEConfig:
             max_length=int(os.getenv('MAX_LENGTH', '2048')),
             batch_size=int(os.getenv('BATCH_SIZE', '4')),
             learning_rate=float(os.getenv('LEARNING_RATE', '2e-4')),
+            gradient_accumulation_steps=int(os.getenv('GRADIENT_ACCUMULATION_STEPS', '8')),
+            quantization=os.getenv('QUANTIZATION', 'none'),
+            compile_model=os.getenv('COMPILE_MODEL', 'true').lower() == 'true',
             update_interval_hours=int(os.getenv('UPDATE_INTERVAL_HOURS', '6'))
         )
-@dataclass
+@dataclass(frozen=True)
 class ModelTrainerConfig:
     """Konfigurasi sistem pelatihan model AI"""
 
     # Pengaturan unggahan file
     max_file_size: int = 100 * 1024 * 1024  # 100MB
-    supported_formats: List[str] = None
+    supported_formats: List[str] = field(default_factory=lambda: ['.json', '.jsonl', '.csv', '.txt', '.parquet'])
     upload_directory: Path = Path("./uploads")
 
     # Pengaturan model
-    base_models: List[str] = None
+    base_models: List[str] = field(default_factory=lambda: [
+        'gpt-3.5-turbo', 'gpt-4', 'gpt-4-turbo',
+        'llama-2-7b', 'llama-2-13b',
+        'mistral-7b', 'mistral-8x7b',
+        'bert-base-uncased', 'bert-large-uncased',
+        'roberta-base', 'distilbert-base-uncased'
+    ])
     default_learning_rate: float = 0.001
     default_batch_size: int = 4
     default_epochs: int = 3
@@ -75,21 +97,15 @@ class ModelTrainerConfig:
     models_directory: Path = Path("./models")
     logs_directory: Path = Path("./logs")
 
-    def __post_init__(self):
-        if self.supported_formats is None:
-            self.supported_formats = ['.json', '.jsonl', '.csv', '.txt', '.parquet']
+    # Redis bersama untuk state job/model antar worker (kosong = hanya in-process)
+    redis_url: Optional[str] = None
 
-        if self.base_models is None:
-            self.base_models = [
-                'gpt-3.5-turbo', 'gpt-4', 'gpt-4-turbo',
-                'llama-2-7b', 'llama-2-13b',
-                'mistral-7b', 'mistral-8x7b',
-                'bert-base-uncased', 'bert-large-uncased',
-                'roberta-base', 'distilbert-base-uncased'
-            ]
+    def __post_init__(self):
+        self.ensure_dirs()
 
-        for path in [self.upload_directory, self.models_directory, self.logs_directory]:
-            path.mkdir(exist_ok=True, parents=True)
+    def ensure_dirs(self):
+        """Pastikan direktori unggahan, model, dan log tersedia"""
+        _ensure_dirs((self.upload_directory, self.models_directory, self.logs_directory))
 
     @classmethod
     def from_env(cls) -> 'ModelTrainerConfig':
@@ -107,44 +123,6 @@ class ModelTrainerConfig:
             max_retries=int(os.getenv('MAX_RETRIES', '3')),
             upload_directory=Path(os.getenv('UPLOAD_DIR', './uploads')),
             models_directory=Path(os.getenv('MODELS_DIR', './models')),
-            logs_directory=Path(os.getenv('LOGS_DIR', './logs'))
+            logs_directory=Path(os.getenv('LOGS_DIR', './logs')),
+            redis_url=os.getenv('REDIS_URL') or None
         )
-
-
-# @dataclass
-# class BrandConfig:
-#     """Konfigurasi tampilan merek untuk penyesuaian white-label"""
-
-#     company_name: str = "AI Model Trainer"
-#     logo_url: str = ""
-#     primary_color: str = "#3b82f6"
-#     secondary_color: str = "#1e40af"
-#     accent_color: str = "#10b981"
-#     background_color: str = "#f8fafc"
-#     text_color: str = "#1f2937"
-
-#     # Kustomisasi CSS
-#     custom_css: str = ""
-
-#     # Penyesuaian footer dan header
-#     show_footer: bool = True
-#     footer_text: str = "Powered by AI Model Trainer"
-#     header_title: str = ""
-#     header_subtitle: str = "Train custom AI models with your data"
-
-#     def to_dict(self) -> Dict[str, Any]:
-#         """Konversi ke dict untuk serialisasi JSON"""
-#         return {
-#             'company_name': self.company_name,
-#             'logo_url': self.logo_url,
-#             'primary_color': self.primary_color,
-#             'secondary_color': self.secondary_color,
-#             'accent_color': self.accent_color,
-#             'background_color': self.background_color,
-#             'text_color': self.text_color,
-#             'custom_css': self.custom_css,
-#             'show_footer': self.show_footer,
-#             'footer_text': self.footer_text,
-#             'header_title': self.header_title,
-#             'header_subtitle': self.header_subtitle
-#         }
\ No newline at end of file
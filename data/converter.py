@@ -2,6 +2,13 @@ import json
 import csv
 import os
 
+try:
+    import ijson
+    _IJSON_ERRORS = (ijson.JSONError, ijson.IncompleteJSONError)
+except ImportError:  # tanpa ijson, file dibaca sekaligus
+    ijson = None
+    _IJSON_ERRORS = ()
+
 # --- KONFIGURASI NAMA FILE ---
 JSON_FILE_PATH = 'anime_dataset_1000.json'
 CSV_FILE_PATH = 'anime_dataset_1000.csv'
@@ -17,47 +24,45 @@ def convert_json_to_csv():
         print("Pastikan Anda sudah menjalankan skrip 'generate_dataset.py' terlebih dahulu.")
         return
 
-    # 2. Baca file JSON
+    # 2. Baca JSON secara streaming dan tulis langsung ke CSV,
+    #    sehingga memori puncak hanya sebesar satu record.
+    #    Ditulis ke file .tmp dulu; CSV lama hanya diganti setelah parse sukses
+    tmp_path = CSV_FILE_PATH + '.tmp'
     try:
-        with open(JSON_FILE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        print(f"Berhasil membaca {len(data)} data dari '{JSON_FILE_PATH}'.")
-    except json.JSONDecodeError:
-        print(f"Error: Gagal mem-parsing file '{JSON_FILE_PATH}'. Pastikan formatnya benar.")
-        return
-    except Exception as e:
-        print(f"Terjadi error saat membaca file: {e}")
-        return
+        with open(JSON_FILE_PATH, 'rb') as src, open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            if ijson is not None:
+                entries = ijson.items(src, 'item')
+            else:
+                entries = json.load(src)
 
-    # 3. Tulis ke file CSV
-    try:
-        with open(CSV_FILE_PATH, 'w', newline='', encoding='utf-8') as f:
             # Tentukan nama kolom untuk header CSV
             header = ['Instruction', 'Input', 'Response']
-            writer = csv.DictWriter(f, fieldnames=header)
+            writer = csv.writer(f)
 
             # Tulis header ke file CSV
-            writer.writeheader()
+            writer.writerow(header)
+
+            # Setiap entri adalah dict dengan satu kunci (mis: "dataset_example_0001");
+            # next(iter(entry.values())) mengambil nilainya tanpa membuat list sementara.
+            count = 0
+            for entry in entries:
+                row = next(iter(entry.values()))
+                writer.writerow((row.get('Instruction', ''), row.get('Input', ''), row.get('Response', '')))
+                count += 1
 
-            # Proses setiap entri dalam data JSON
-            for entry in data:
-                # Karena setiap entri adalah dict dengan satu kunci (mis: "dataset_example_0001"),
-                # kita ambil nilainya (value) yang berisi data sebenarnya.
-                # list(entry.values())[0] adalah cara cepat untuk mendapatkan value tersebut.
-                actual_data = list(entry.values())[0]
-                
-                # Tulis baris data ke file CSV
-                writer.writerow({
-                    'Instruction': actual_data.get('Instruction', ''),
-                    'Input': actual_data.get('Input', ''),
-                    'Response': actual_data.get('Response', '')
-                })
-        
+        os.replace(tmp_path, CSV_FILE_PATH)
+
+        print(f"Berhasil membaca {count} data dari '{JSON_FILE_PATH}'.")
         print(f"\nKonversi berhasil!")
         print(f"Data telah disimpan ke '{CSV_FILE_PATH}'.")
 
+    except (json.JSONDecodeError, *_IJSON_ERRORS):
+        print(f"Error: Gagal mem-parsing file '{JSON_FILE_PATH}'. Pastikan formatnya benar.")
     except Exception as e:
-        print(f"Terjadi error saat menulis file CSV: {e}")
+        print(f"Terjadi error saat konversi: {e}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 # --- JALANKAN FUNGSI UTAMA ---
 if __name__ == '__main__':
@@ -1,115 +1,74 @@
 """
 Training dataset generation module
 """
-import json
+import orjson
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional
 import logging
+from bisect import bisect_right
+from functools import lru_cache
+from operator import itemgetter
 
-from database.models import CVEDatabase
+from database.models import CVEDatabase, get_db
 from config.settings import CVEConfig
 
 logger = logging.getLogger(__name__)
 
-class DatasetGenerator:
-    """Generate training dataset dalam format instruction"""
-    
-    def __init__(self, config: CVEConfig):
-        self.config = config
-        self.db = CVEDatabase()
-    
-    def generate_instruction_dataset(self) -> List[Dict]:
-        """Generate dataset dalam format instruction-input-output"""
-        logger.info("Generating instruction dataset")
-        
-        # Get recent CVEs from database
-        recent_cves = self.db.get_recent_cves(limit=1000)
-        
-        dataset = []
-        
-        # CVE Analysis Instructions
-        for cve_data in recent_cves:
-            # Basic CVE analysis
-            dataset.append({
-                "instruction": "Analyze this CVE and provide a security assessment",
-                "input": f"CVE ID: {cve_data['cve_id']}\nDescription: {cve_data['description']}\nSeverity: {cve_data['severity']}",
-                "output": self._generate_cve_analysis(cve_data),
-                "category": "cve_analysis"
-            })
-            
-            # Risk assessment
-            dataset.append({
-                "instruction": "Provide a risk assessment for this vulnerability",
-                "input": f"CVE: {cve_data['cve_id']}\nCVSS Score: {cve_data['severity']}\nCWE: {cve_data['cwe_id']}",
-                "output": self._generate_risk_assessment(cve_data),
-                "category": "risk_assessment"
-            })
-            
-            # Mitigation recommendations
-            dataset.append({
-                "instruction": "Suggest mitigation strategies for this vulnerability",
-                "input": f"Vulnerability: {cve_data['description']}\nCWE Type: {cve_data['cwe_id']}",
-                "output": self._generate_mitigation_advice(cve_data),
-                "category": "mitigation"
-            })
-        
-        # Add threat intelligence and detection rules
-        dataset.extend(self._generate_threat_intel_instructions())
-        dataset.extend(self._generate_detection_rules_instructions())
-        
-        logger.info(f"Generated {len(dataset)} instruction samples")
-        return dataset
-    
-    def _generate_cve_analysis(self, cve_data: Dict) -> str:
-        """Generate CVE analysis output"""
-        severity_level = self._get_severity_level(cve_data['severity'])
-        
-        return f"""**CVE Analysis for {cve_data['cve_id']}**
+# Batas bawah CVSS untuk Medium, High, Critical
+_SEV_THRESHOLDS = (4.0, 7.0, 9.0)
+_SEV_LABELS = ("Low", "Medium", "High", "Critical")
+
+# Likelihood of exploitation per (severity level, exploit available):
+# only CVSS >= 7.0 (High/Critical) rises above Low
+_LIKELIHOOD = {
+    ('Critical', True): 'High', ('Critical', False): 'Medium',
+    ('High', True): 'High', ('High', False): 'Medium',
+    ('Medium', True): 'Low', ('Medium', False): 'Low',
+    ('Low', True): 'Low', ('Low', False): 'Low',
+}
+_SEV_LOWER = {label: label.lower() for label in _SEV_LABELS}
+
+# Template output per CVE, diisi sekali per CVE lewat str.format_map
+_ANALYSIS_TEMPLATE = """**CVE Analysis for {cve_id}**
 
-**Severity Level**: {severity_level} (CVSS: {cve_data['severity']})
+**Severity Level**: {severity_level} (CVSS: {severity})
 
-**Summary**: This vulnerability has been classified as {severity_level.lower()} priority based on its CVSS score of {cve_data['severity']}.
+**Summary**: This vulnerability has been classified as {severity_level_lower} priority based on its CVSS score of {severity}.
 
-**Technical Details**: {cve_data['description'][:200]}...
+**Technical Details**: {description_200}...
 
-**Weakness Classification**: {cve_data['cwe_id']}
+**Weakness Classification**: {cwe_id}
 
-**Exploitation Risk**: {'High - Exploit code available' if cve_data['exploit_available'] else 'Medium - No public exploits detected'}
+**Exploitation Risk**: {exploitation_risk}
 
 **Recommended Actions**:
-1. Apply security patches immediately if {severity_level.lower()} priority
+1. Apply security patches immediately if {severity_level_lower} priority
 2. Monitor for suspicious activity
 3. Review system configurations
 4. Update detection rules"""
-    
-    def _generate_risk_assessment(self, cve_data: Dict) -> str:
-        """Generate risk assessment"""
-        risk_level = self._get_severity_level(cve_data['severity'])
-        
-        return f"""**Risk Assessment**
 
-**Overall Risk**: {risk_level}
-**CVSS Base Score**: {cve_data['severity']}/10.0
+_RISK_TEMPLATE = """**Risk Assessment**
+
+**Overall Risk**: {severity_level}
+**CVSS Base Score**: {severity}/10.0
 
 **Risk Factors**:
-- Severity Score: {cve_data['severity']}
-- Exploit Availability: {'Yes' if cve_data['exploit_available'] else 'No'}
-- Weakness Type: {cve_data['cwe_id']}
+- Severity Score: {severity}
+- Exploit Availability: {exploit_available}
+- Weakness Type: {cwe_id}
 
 **Business Impact**: 
-{risk_level} risk to confidentiality, integrity, and availability of affected systems.
+{severity_level} risk to confidentiality, integrity, and availability of affected systems.
 
 **Likelihood of Exploitation**: 
-{'High' if cve_data['exploit_available'] and cve_data['severity'] >= 7.0 else 'Medium' if cve_data['severity'] >= 7.0 else 'Low'}
+{likelihood}
 
 **Recommendations**:
-1. Prioritize patching for {risk_level.lower()} risk vulnerabilities
+1. Prioritize patching for {severity_level_lower} risk vulnerabilities
 2. Implement compensating controls if patching is delayed
 3. Monitor for indicators of compromise"""
-    
-    def _generate_mitigation_advice(self, cve_data: Dict) -> str:
-        """Generate mitigation advice"""
-        return f"""**Mitigation Strategies**
+
+_MITIGATION_TEMPLATE = """**Mitigation Strategies**
 
 **Immediate Actions**:
 1. Apply vendor security patches
@@ -133,11 +92,93 @@ class DatasetGenerator:
 3. Regular security assessments
 4. Threat intelligence integration
 
-**Specific Recommendations for {cve_data['cwe_id']}**:
+**Specific Recommendations for {cwe_id}**:
 - Implement input validation controls
 - Review authentication mechanisms
 - Validate access controls
 - Monitor for anomalous behavior"""
+
+class DatasetGenerator:
+    """Generate training dataset dalam format instruction"""
+    
+    def __init__(self, config: CVEConfig, db: Optional[CVEDatabase] = None):
+        self.config = config
+        self.db = db or get_db()
+    
+    def generate_instruction_dataset(self) -> List[Dict]:
+        """Generate dataset dalam format instruction-input-output"""
+        dataset = list(self.iter_instruction_samples())
+        logger.info(f"Generated {len(dataset)} instruction samples")
+        return dataset
+    
+    def iter_instruction_samples(self, cves: Optional[Iterable[Dict]] = None) -> Iterator[Dict]:
+        """Yield instruction samples as CVE rows stream in (default: recent CVEs from the database)"""
+        logger.info("Generating instruction dataset")
+        fields = itemgetter('cve_id', 'description', 'severity', 'cwe_id')
+        if cves is None:
+            cves = self.db.iter_recent_cves(limit=1000)
+        
+        # CVE Analysis Instructions
+        for cve_data in cves:
+            cve_id, description, severity, cwe_id = fields(cve_data)
+            ctx = self._template_context(cve_data, self._get_severity_level(severity))
+            
+            # Basic CVE analysis
+            yield {
+                "instruction": "Analyze this CVE and provide a security assessment",
+                "input": f"CVE ID: {cve_id}\nDescription: {description}\nSeverity: {severity}",
+                "output": self._generate_cve_analysis(ctx),
+                "category": "cve_analysis"
+            }
+            
+            # Risk assessment
+            yield {
+                "instruction": "Provide a risk assessment for this vulnerability",
+                "input": f"CVE: {cve_id}\nCVSS Score: {severity}\nCWE: {cwe_id}",
+                "output": self._generate_risk_assessment(ctx),
+                "category": "risk_assessment"
+            }
+            
+            # Mitigation recommendations
+            yield {
+                "instruction": "Suggest mitigation strategies for this vulnerability",
+                "input": f"Vulnerability: {description}\nCWE Type: {cwe_id}",
+                "output": self._generate_mitigation_advice(ctx),
+                "category": "mitigation"
+            }
+        
+        # Add threat intelligence and detection rules
+        yield from self._generate_threat_intel_instructions()
+        yield from self._generate_detection_rules_instructions()
+    
+    @staticmethod
+    def _template_context(cve_data: Dict, severity_level: str) -> Dict:
+        """Values shared by the three per-CVE output templates"""
+        severity = cve_data['severity']
+        exploit_available = cve_data['exploit_available']
+        return {
+            'cve_id': cve_data['cve_id'],
+            'severity': severity,
+            'cwe_id': cve_data['cwe_id'],
+            'severity_level': severity_level,
+            'severity_level_lower': _SEV_LOWER[severity_level],
+            'description_200': cve_data['description'][:200],
+            'exploitation_risk': 'High - Exploit code available' if exploit_available else 'Medium - No public exploits detected',
+            'exploit_available': 'Yes' if exploit_available else 'No',
+            'likelihood': _LIKELIHOOD[(severity_level, bool(exploit_available))],
+        }
+    
+    def _generate_cve_analysis(self, ctx: Dict) -> str:
+        """Generate CVE analysis output"""
+        return _ANALYSIS_TEMPLATE.format_map(ctx)
+    
+    def _generate_risk_assessment(self, ctx: Dict) -> str:
+        """Generate risk assessment"""
+        return _RISK_TEMPLATE.format_map(ctx)
+    
+    def _generate_mitigation_advice(self, ctx: Dict) -> str:
+        """Generate mitigation advice"""
+        return _MITIGATION_TEMPLATE.format_map(ctx)
     
     def _generate_threat_intel_instructions(self) -> List[Dict]:
         """Generate threat intelligence instruction samples"""
@@ -182,20 +223,24 @@ level: high""",
             }
         ]
     
-    def _get_severity_level(self, severity: float) -> str:
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _get_severity_level(severity: float) -> str:
         """Get severity level from CVSS score"""
-        if severity >= 9.0:
-            return "Critical"
-        elif severity >= 7.0:
-            return "High"
-        elif severity >= 4.0:
-            return "Medium"
-        else:
-            return "Low"
+        # bisect_right so a score equal to a threshold falls into the higher band
+        return _SEV_LABELS[bisect_right(_SEV_THRESHOLDS, severity)]
     
-    def save_dataset(self, dataset: List[Dict], filename: str = "cve_training_dataset.json"):
-        """Save dataset to file"""
+    def save_dataset(self, dataset: Iterable[Dict], filename: str = "cve_training_dataset.json"):
+        """Save dataset to file, writing samples as they are produced"""
         filepath = self.config.data_dir / filename
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(dataset, f, indent=2, ensure_ascii=False)
-        logger.info(f"Dataset saved to {filepath}")
+        count = 0
+        # orjson emits UTF-8 bytes, matching the old ensure_ascii=False output;
+        # each sample is re-indented so the file matches a whole-list OPT_INDENT_2 dump
+        with open(filepath, 'wb') as f:
+            f.write(b"[")
+            for sample in dataset:
+                f.write(b",\n  " if count else b"\n  ")
+                f.write(orjson.dumps(sample, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  "))
+                count += 1
+            f.write(b"\n]" if count else b"]")
+        logger.info(f"Dataset saved to {filepath} ({count} samples)")
@@ -1,5 +1,15 @@
 import json
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from operator import or_
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # --- KOLAM DATA (BISA DIPERLUAS) ---
 # Tambahkan lebih banyak anime, karakter, istilah, dll. untuk dataset yang lebih kaya
@@ -37,31 +47,32 @@ TERMS_TROPE = {
     'Deredere': 'Tipe karakter yang sangat manis, energik, dan penuh kasih sayang kepada semua orang, terutama orang yang mereka cintai.'
 }
 
+# --- INDEKS TURUNAN (dihitung sekali saat import) ---
+
+ANIME_KEYS = tuple(ANIME_DB)
+# Satu bit per genre; irisan genre = AND integer, bukan operasi set
+_GENRE_BITS = {g: 1 << i for i, g in enumerate(sorted({g for d in ANIME_DB.values() for g in d['genre'].split(', ')}))}
+ANIME_GENRE_MASK = {name: reduce(or_, (_GENRE_BITS[g] for g in d['genre'].split(', '))) for name, d in ANIME_DB.items()}
+ANIME_FIRST_GENRE_LOWER = {name: d['genre'].split(', ')[0].lower() for name, d in ANIME_DB.items()}
+ANIME_FIRST_THEME_LOWER = {name: d['theme'].split(', ')[0].lower() for name, d in ANIME_DB.items()}
+_CHAR_ITEMS = list(CHARACTERS.items())
+_TERM_ITEMS = list(TERMS_TROPE.items())
+
 # --- TEMPLAT INSTRUKSI DAN RESPON ---
 
 def generate_recommendation():
-    anime_keys = list(ANIME_DB.keys())
     seed_count = random.randint(1, 2)
-    seed_animes = random.sample(anime_keys, seed_count)
+    seed_animes = random.sample(ANIME_KEYS, seed_count)
     
     instruction = "Anda adalah ahli anime. Berikan rekomendasi anime yang relevan berdasarkan preferensi pengguna. Jelaskan mengapa anime itu cocok."
     
-    input_text = f"Tolong rekomendasikan anime. Aku suka {seed_animes[0]} karena tema {ANIME_DB[seed_animes[0]]['theme'].split(', ')[0].lower()}."
+    input_text = f"Tolong rekomendasikan anime. Aku suka {seed_animes[0]} karena tema {ANIME_FIRST_THEME_LOWER[seed_animes[0]]}."
     if len(seed_animes) > 1:
         input_text += f" Aku juga menikmati {seed_animes[1]}."
 
     # Cari rekomendasi yang cocok
-    seed_genres = set()
-    for anime in seed_animes:
-        seed_genres.update(ANIME_DB[anime]['genre'].split(', '))
-
-    recommendations = []
-    for anime, details in ANIME_DB.items():
-        if anime in seed_animes:
-            continue
-        anime_genres = set(details['genre'].split(', '))
-        if len(seed_genres.intersection(anime_genres)) > 0:
-            recommendations.append(anime)
+    seed_mask = reduce(or_, (ANIME_GENRE_MASK[a] for a in seed_animes))
+    recommendations = [a for a in ANIME_KEYS if a not in seed_animes and ANIME_GENRE_MASK[a] & seed_mask]
     
     if not recommendations:
         return None # Coba lagi jika tidak ada rekomendasi yang cocok
@@ -71,12 +82,12 @@ def generate_recommendation():
     response_text = "Tentu, berdasarkan anime yang kamu suka, berikut adalah beberapa rekomendasi:\n\n"
     for rec in final_recs:
         response_text += f"**1. {rec}**\n"
-        response_text += f"*Alasan:* Mirip dengan '{seed_animes[0]}', anime ini memiliki genre '{ANIME_DB[rec]['genre']}' dan mengangkat tema tentang {ANIME_DB[rec]['theme'].split(', ')[0].lower()}.\n\n"
+        response_text += f"*Alasan:* Mirip dengan '{seed_animes[0]}', anime ini memiliki genre '{ANIME_DB[rec]['genre']}' dan mengangkat tema tentang {ANIME_FIRST_THEME_LOWER[rec]}.\n\n"
 
     return {"Instruction": instruction, "Input": input_text, "Response": response_text}
 
 def generate_explanation():
-    term, explanation = random.choice(list(TERMS_TROPE.items()))
+    term, explanation = random.choice(_TERM_ITEMS)
     
     instruction = "Jelaskan istilah atau trope umum dalam dunia anime dan budaya pop Jepang."
     input_text = f"Apa itu '{term}'?"
@@ -85,7 +96,7 @@ def generate_explanation():
     return {"Instruction": instruction, "Input": input_text, "Response": response_text}
 
 def generate_character_analysis():
-    char, anime = random.choice(list(CHARACTERS.items()))
+    char, anime = random.choice(_CHAR_ITEMS)
     
     instruction = f"Berikan analisis singkat tentang karakter dari anime."
     input_text = f"Bisa tolong analisis karakter {char} dari anime {anime}?"
@@ -98,7 +109,7 @@ def generate_character_analysis():
 
 def generate_comparison():
     try:
-        anime1, anime2 = random.sample(list(ANIME_DB.keys()), 2)
+        anime1, anime2 = random.sample(ANIME_KEYS, 2)
     except ValueError:
         return None
 
@@ -117,30 +128,52 @@ def generate_comparison():
                      f"- Genre: {details2['genre']}\n"
                      f"- Tema Utama: {details2['theme']}\n"
                      f"- Studio: {details2['studio']}\n\n"
-                     f"Secara singkat, sementara {anime1} berfokus pada narasi {details1['genre'].split(', ')[0].lower()}, {anime2} lebih menonjol dalam aspek {details2['genre'].split(', ')[0].lower()}.")
+                     f"Secara singkat, sementara {anime1} berfokus pada narasi {ANIME_FIRST_GENRE_LOWER[anime1]}, {anime2} lebih menonjol dalam aspek {ANIME_FIRST_GENRE_LOWER[anime2]}.")
 
     return {"Instruction": instruction, "Input": input_text, "Response": response_text}
 
 # --- FUNGSI UTAMA ---
 
+DATASET_SIZE = 1000
+
+TASK_GENERATORS = (
+    generate_recommendation,
+    generate_explanation,
+    generate_character_analysis,
+    generate_comparison
+)
+
+def _produce(count, seed):
+    """Generate count entries in a worker process with its own RNG seed"""
+    random.seed(seed)
+    entries = [None] * count
+    filled = 0
+    while filled < count:
+        # Undi generator sekaligus untuk sisa slot; ulangi bila ada yang gagal
+        for generator in random.choices(TASK_GENERATORS, k=count - filled):
+            data_entry = generator()
+            if data_entry: # Memastikan generator berhasil membuat data
+                entries[filled] = data_entry
+                filled += 1
+    return entries
+
 def main():
-    dataset = []
-    task_generators = [
-        generate_recommendation,
-        generate_explanation,
-        generate_character_analysis,
-        generate_comparison
-    ]
-
-    while len(dataset) < 1000:
-        generator = random.choice(task_generators)
-        data_entry = generator()
-        if data_entry: # Memastikan generator berhasil membuat data
-            dataset.append({f"dataset_example_{len(dataset)+1:04}": data_entry})
-
-    # Menyimpan dataset ke file JSON
-    with open('anime_dataset_1000.json', 'w', encoding='utf-8') as f:
-        json.dump(dataset, f, ensure_ascii=False, indent=2)
+    # Bagi rata ke semua core; seed per worker diturunkan dari RNG utama
+    workers = min(os.cpu_count() or 1, DATASET_SIZE)
+    counts = [DATASET_SIZE // workers + (i < DATASET_SIZE % workers) for i in range(workers)]
+    seeds = [random.getrandbits(64) for _ in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        entries = [entry for chunk in pool.map(_produce, counts, seeds) for entry in chunk]
+
+    # Key per entri dibuat sekali di akhir, format file tetap sama
+    dataset = [{f"dataset_example_{i:04}": entry} for i, entry in enumerate(entries, 1)]
+
+    # Menyimpan dataset ke file JSON: serialize sekali, tulis sekali
+    output = Path('anime_dataset_1000.json')
+    if orjson is not None:
+        output.write_bytes(orjson.dumps(dataset, option=orjson.OPT_INDENT_2))
+    else:
+        output.write_text(json.dumps(dataset, ensure_ascii=False, indent=2), encoding='utf-8')
 
     print("Dataset berhasil dibuat! Cek file 'anime_dataset_1000.json'")
 
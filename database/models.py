@@ -2,10 +2,12 @@
 Database models and operations for CVE data
 """
 import sqlite3
-import json
+import orjson
+import threading
 import pandas as pd
 from datetime import datetime
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
 from pathlib import Path
 
 class CVEDatabase:
@@ -13,11 +15,30 @@ class CVEDatabase:
     
     def __init__(self, db_path: str = "cve_database.db"):
         self.db_path = db_path
+        self._local = threading.local()
         self.init_database()
     
+    def _connection(self) -> sqlite3.Connection:
+        """Get persistent connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Scraper thread dan event loop bisa menulis bersamaan: writer kedua
+            # menunggu lock (busy timeout), bukan langsung "database is locked"
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            # dict(row) dari sqlite3.Row dibangun di C, tanpa zip kolom per baris
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-131072")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+        return conn
+    
     def init_database(self):
         """Initialize database tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        conn = self._connection()
+        with conn:
             cursor = conn.cursor()
             
             # CVE Data Table
@@ -61,11 +82,17 @@ class CVEDatabase:
                 )
             """)
             
-            conn.commit()
+            # get_recent_cves jadi index range scan; lookup exploit per CVE
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_cve_pub ON cve_data(published_date DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_exp_cve ON exploits(cve_id)")
+            
+            # WAL tersimpan di file DB; PRAGMA per-koneksi ada di _connection()
+            cursor.execute("PRAGMA journal_mode=WAL")
     
     def insert_cve(self, cve_data: Dict):
         """Insert CVE data"""
-        with sqlite3.connect(self.db_path) as conn:
+        conn = self._connection()
+        with conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT OR REPLACE INTO cve_data 
@@ -80,40 +107,96 @@ class CVEDatabase:
                 cve_data.get('published_date'),
                 cve_data.get('modified_date'),
                 cve_data.get('cwe_id'),
-                json.dumps(cve_data.get('references_list', [])),
+                orjson.dumps(cve_data.get('references_list', [])).decode(),
                 cve_data.get('exploit_available', 0)
             ))
-            conn.commit()
+    
+    def insert_cves_bulk(self, cves: Iterable[Dict]):
+        """Insert many CVEs with one executemany in a single transaction"""
+        rows = (
+            (
+                cve_data.get('cve_id'),
+                cve_data.get('description'),
+                cve_data.get('severity'),
+                cve_data.get('cvss_vector'),
+                cve_data.get('published_date'),
+                cve_data.get('modified_date'),
+                cve_data.get('cwe_id'),
+                orjson.dumps(cve_data.get('references_list', [])).decode(),
+                cve_data.get('exploit_available', 0)
+            )
+            for cve_data in cves
+        )
+        conn = self._connection()
+        with conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO cve_data 
+                (cve_id, description, severity, cvss_vector, published_date, 
+                 modified_date, cwe_id, references_list, exploit_available)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+    
+    def get_modified_dates(self, cve_ids: List[str]) -> Dict[str, str]:
+        """Map stored cve_id -> modified_date for the given IDs"""
+        conn = self._connection()
+        modified = {}
+        # Batas jumlah parameter SQLite (999 di build lama)
+        for start in range(0, len(cve_ids), 900):
+            batch = cve_ids[start:start + 900]
+            placeholders = ",".join("?" * len(batch))
+            modified.update(conn.execute(
+                f"SELECT cve_id, modified_date FROM cve_data WHERE cve_id IN ({placeholders})", batch
+            ).fetchall())
+        return modified
+    
+    def exploited_cve_ids(self) -> set:
+        """CVE IDs that have at least one stored exploit"""
+        cursor = self._connection().execute("SELECT DISTINCT cve_id FROM exploits")
+        return {row[0] for row in cursor}
+    
+    def mark_exploited_cves(self):
+        """Set exploit_available on CVEs that have a stored exploit"""
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                UPDATE cve_data SET exploit_available = 1
+                WHERE exploit_available = 0 AND cve_id IN (SELECT cve_id FROM exploits)
+            """)
     
     def get_cve(self, cve_id: str) -> Optional[Dict]:
         """Get CVE data by ID"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM cve_data WHERE cve_id = ?", (cve_id,))
-            row = cursor.fetchone()
-            
-            if row:
-                columns = [desc[0] for desc in cursor.description]
-                return dict(zip(columns, row))
-            return None
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT * FROM cve_data WHERE cve_id = ?", (cve_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
     
     def get_recent_cves(self, limit: int = 100) -> List[Dict]:
         """Get recent CVEs"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM cve_data 
-                ORDER BY published_date DESC 
-                LIMIT ?
-            """, (limit,))
-            
-            rows = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            return [dict(zip(columns, row)) for row in rows]
+        cursor = self._connection().cursor()
+        cursor.execute("""
+            SELECT * FROM cve_data 
+            ORDER BY published_date DESC 
+            LIMIT ?
+        """, (limit,))
+        
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def iter_recent_cves(self, limit: int = 100) -> Iterator[Dict]:
+        """Yield recent CVEs one row at a time from the cursor"""
+        cursor = self._connection().cursor()
+        cursor.execute("""
+            SELECT * FROM cve_data 
+            ORDER BY published_date DESC 
+            LIMIT ?
+        """, (limit,))
+        
+        for row in cursor:
+            yield dict(row)
     
     def insert_exploit(self, exploit_data: Dict):
         """Insert exploit data"""
-        with sqlite3.connect(self.db_path) as conn:
+        conn = self._connection()
+        with conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO exploits 
@@ -126,11 +209,31 @@ class CVEDatabase:
                 exploit_data.get('source'),
                 exploit_data.get('date_added')
             ))
-            conn.commit()
+    
+    def insert_exploits_bulk(self, exploits: Iterable[Dict]):
+        """Insert many exploits with one executemany in a single transaction"""
+        rows = (
+            (
+                exploit_data.get('cve_id'),
+                exploit_data.get('exploit_title'),
+                exploit_data.get('exploit_code'),
+                exploit_data.get('source'),
+                exploit_data.get('date_added')
+            )
+            for exploit_data in exploits
+        )
+        conn = self._connection()
+        with conn:
+            conn.executemany("""
+                INSERT INTO exploits 
+                (cve_id, exploit_title, exploit_code, source, date_added)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
     
     def insert_training_data(self, training_data: Dict):
         """Insert training data"""
-        with sqlite3.connect(self.db_path) as conn:
+        conn = self._connection()
+        with conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO training_data 
@@ -142,9 +245,20 @@ class CVEDatabase:
                 training_data.get('output'),
                 training_data.get('category')
             ))
-            conn.commit()
     
     def get_training_data(self) -> pd.DataFrame:
         """Get all training data as DataFrame"""
-        with sqlite3.connect(self.db_path) as conn:
-            return pd.read_sql_query("SELECT * FROM training_data", conn)
+        return pd.read_sql_query("SELECT * FROM training_data", self._connection())
+    
+    def iter_training_data(self, chunksize: int = 10_000) -> Iterator[pd.DataFrame]:
+        """Yield training data as DataFrames of at most chunksize rows"""
+        yield from pd.read_sql_query(
+            "SELECT instruction, input_text, output_text, category FROM training_data",
+            self._connection(),
+            chunksize=chunksize
+        )
+
+@lru_cache(maxsize=None)
+def get_db(db_path: str = "cve_database.db") -> CVEDatabase:
+    """Shared CVEDatabase per path; connections stay per-thread inside it"""
+    return CVEDatabase(db_path)
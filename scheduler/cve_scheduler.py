@@ -1,12 +1,13 @@
 """
 Scheduler module for automated CVE updates and model retraining
 """
-import schedule
-import time
 import asyncio
 import logging
 from datetime import datetime
 
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+
 from config.settings import CVEConfig
 from scrapers.cve_scraper import CVEScraper
 from data.dataset_generator import DatasetGenerator
@@ -23,21 +24,25 @@ class CVEScheduler:
         self.dataset_generator = DatasetGenerator(config)
         self.trainer = CVEModelTrainer(config)
     
-    def update_cve_data(self):
+    async def update_cve_data(self):
         """Update CVE data dari semua sumber"""
         logger.info("Starting scheduled CVE data update")
         
         try:
-            # Scrape new CVEs
-            asyncio.run(self.scraper.scrape_nvd_cves(days_back=1))
-            
-            # Scrape exploits
-            self.scraper.scrape_exploit_db()
+            # Scrape new CVEs and exploits (blocking Exploit-DB di thread)
+            await asyncio.gather(
+                asyncio.to_thread(self.scraper.scrape_exploit_db),
+                self.scraper.scrape_nvd_cves(days_back=1),
+            )
+            await asyncio.to_thread(self.scraper.db.mark_exploited_cves)
             
             # Generate new training data
-            dataset = self.dataset_generator.generate_instruction_dataset()
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            self.dataset_generator.save_dataset(dataset, f"dataset_{timestamp}.json")
+            await asyncio.to_thread(
+                self.dataset_generator.save_dataset,
+                self.dataset_generator.iter_instruction_samples(),
+                f"dataset_{timestamp}.json"
+            )
             
             logger.info("CVE data update completed successfully")
             
@@ -60,17 +65,22 @@ class CVEScheduler:
         except Exception as e:
             logger.error(f"Error during model retraining: {e}")
     
-    def start_scheduler(self):
-        """Start scheduled tasks"""
+    async def start_scheduler(self):
+        """Start scheduled tasks and run until cancelled"""
+        # AsyncIOScheduler tidur sampai fire time berikutnya (tanpa polling);
+        # job sync (retraining) dijalankan di thread pool-nya
+        scheduler = AsyncIOScheduler()
+        
         # Daily CVE updates
-        schedule.every().day.at("06:00").do(self.update_cve_data)
-        schedule.every().day.at("18:00").do(self.update_cve_data)
+        scheduler.add_job(self.update_cve_data, CronTrigger(hour='6,18', minute=0))
         
         # Weekly model retraining
-        schedule.every().sunday.at("02:00").do(self.retrain_model_weekly)
+        scheduler.add_job(self.retrain_model_weekly, CronTrigger(day_of_week='sun', hour=2, minute=0))
         
+        scheduler.start()
         logger.info("Scheduler started - CVE updates every 12 hours, model retraining weekly")
         
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+        try:
+            await asyncio.Event().wait()
+        finally:
+            scheduler.shutdown(wait=False)
@@ -1,67 +1,107 @@
 """
 CVE data scraping module
 """
+import aiohttp
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import asyncio
-import json
+import orjson
+import queue
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 import logging
 
-from database.models import CVEDatabase
+from database.models import get_db
 from config.settings import CVEConfig
 
 logger = logging.getLogger(__name__)
 
+# NVD API 2.0: maksimum 2000 hasil per page
+NVD_PAGE_SIZE = 2000
+NVD_MAX_CONCURRENT_PAGES = 5
+# Page yang kena rate limit (403/429) atau 5xx dicoba ulang dengan backoff
+NVD_PAGE_RETRIES = 3
+NVD_RETRY_BACKOFF = 6
+NVD_RETRY_STATUS = (403, 429, 500, 502, 503, 504)
+NVD_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.000'
+
+MITRE_ATTACK_URL = "https://raw.githubusercontent.com/mitre/cti/master/enterprise-attack/enterprise-attack.json"
+
+USER_AGENT = 'CVE-Analyst-Bot/1.0'
+HTTP_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept-Encoding': 'gzip, deflate'
+}
+
 class CVEScraper:
     """Scraper untuk mengumpulkan data CVE dari berbagai sumber"""
     
     def __init__(self, config: CVEConfig):
         self.config = config
-        self.db = CVEDatabase()
+        self.db = get_db()
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'CVE-Analyst-Bot/1.0'
-        })
+        self.session.headers.update(HTTP_HEADERS)
+        # Pool keep-alive + retry untuk Exploit-DB / MITRE (payload teks besar)
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
     
-    async def scrape_nvd_cves(self, days_back: int = 7) -> List[Dict]:
-        """Scrape CVE data dari NVD"""
+    async def scrape_nvd_cves(self, days_back: int = 7, sink: Optional[queue.Queue] = None) -> List[Dict]:
+        """Scrape CVE data dari NVD; each parsed CVE is also put on sink if given"""
         logger.info(f"Scraping NVD CVEs for last {days_back} days")
         
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days_back)
         
         params = {
-            'pubStartDate': start_date.strftime('%Y-%m-%dT%H:%M:%S.000'),
-            'pubEndDate': end_date.strftime('%Y-%m-%dT%H:%M:%S.000'),
-            'resultsPerPage': 2000
+            'pubStartDate': start_date.strftime(NVD_DATE_FORMAT),
+            'pubEndDate': end_date.strftime(NVD_DATE_FORMAT),
+            'resultsPerPage': NVD_PAGE_SIZE
         }
         
+        headers = {'User-Agent': USER_AGENT}
         if self.config.nvd_api_key:
-            self.session.headers['apiKey'] = self.config.nvd_api_key
+            headers['apiKey'] = self.config.nvd_api_key
         
         try:
-            response = self.session.get(self.config.nvd_base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
             cves = []
-            for vuln in data.get('vulnerabilities', []):
-                cve = vuln.get('cve', {})
-                cve_data = {
-                    'cve_id': cve.get('id'),
-                    'description': self._extract_description(cve),
-                    'severity': self._extract_severity(vuln),
-                    'cvss_vector': self._extract_cvss_vector(vuln),
-                    'published_date': cve.get('published'),
-                    'modified_date': cve.get('lastModified'),
-                    'cwe_id': self._extract_cwe(cve),
-                    'references': self._extract_references(cve)
-                }
-                cves.append(cve_data)
-                self.db.insert_cve(cve_data)
+            async with aiohttp.ClientSession(headers=headers) as session:
+                # NVD membatasi request per 30 detik; batasi page yang in-flight
+                limit = asyncio.Semaphore(NVD_MAX_CONCURRENT_PAGES)
+                
+                async def fetch_page(start_index: int) -> Dict:
+                    for attempt in range(NVD_PAGE_RETRIES + 1):
+                        async with limit:
+                            async with session.get(self.config.nvd_base_url,
+                                                   params={**params, 'startIndex': start_index}) as response:
+                                if response.status not in NVD_RETRY_STATUS or attempt == NVD_PAGE_RETRIES:
+                                    response.raise_for_status()
+                                    return orjson.loads(await response.read())
+                        # Backoff di luar semaphore supaya page lain tetap jalan
+                        await asyncio.sleep(NVD_RETRY_BACKOFF * 2 ** attempt)
+                
+                async def collect_page(start_index: int):
+                    self._collect_nvd_page(await fetch_page(start_index), cves, sink)
+                
+                # Page pertama memberi totalResults; sisanya diambil bersamaan,
+                # page yang gagal tidak membatalkan page yang sudah berhasil
+                first = await fetch_page(0)
+                self._collect_nvd_page(first, cves, sink)
+                starts = range(NVD_PAGE_SIZE, first.get('totalResults', 0), NVD_PAGE_SIZE)
+                results = await asyncio.gather(*(collect_page(i) for i in starts), return_exceptions=True)
+                for start_index, result in zip(starts, results):
+                    if isinstance(result, BaseException):
+                        logger.error(f"NVD page at startIndex={start_index} failed: {result}")
             
+            # Satu transaksi untuk seluruh batch, bukan commit per baris;
+            # CVE yang tidak berubah sejak disimpan tidak ditulis ulang
+            self.db.insert_cves_bulk(self._changed_cves(cves))
             logger.info(f"Scraped {len(cves)} CVEs from NVD")
             return cves
             
@@ -69,31 +109,61 @@ class CVEScraper:
             logger.error(f"Error scraping NVD: {e}")
             return []
     
+    def _collect_nvd_page(self, data: Dict, cves: List[Dict], sink: Optional[queue.Queue]):
+        """Parse one NVD response page into cves (and sink)"""
+        for vuln in data.get('vulnerabilities', []):
+            cve = vuln.get('cve', {})
+            cve_data = {
+                'cve_id': cve.get('id'),
+                'description': self._extract_description(cve),
+                'severity': self._extract_severity(vuln),
+                'cvss_vector': self._extract_cvss_vector(vuln),
+                'published_date': cve.get('published'),
+                'modified_date': cve.get('lastModified'),
+                'cwe_id': self._extract_cwe(cve),
+                'references_list': self._extract_references(cve),
+                'exploit_available': 0
+            }
+            cves.append(cve_data)
+            if sink is not None:
+                sink.put(cve_data)
+    
+    def _changed_cves(self, cves: List[Dict]) -> List[Dict]:
+        """Drop CVEs whose stored modified_date is already up to date"""
+        stored = self.db.get_modified_dates([c['cve_id'] for c in cves])
+        changed = [
+            c for c in cves
+            if c['cve_id'] not in stored or not stored[c['cve_id']] or (c['modified_date'] or '') > stored[c['cve_id']]
+        ]
+        logger.info(f"{len(cves) - len(changed)} CVEs unchanged since last scrape")
+        return changed
+    
     def scrape_exploit_db(self) -> List[Dict]:
         """Scrape exploit database"""
         logger.info("Scraping Exploit Database")
         
         try:
-            response = self.session.get(self.config.exploit_db_url)
-            response.raise_for_status()
+            # Stream body langsung ke C parser pandas, tanpa buffer str/bytes penuh
+            with self.session.get(self.config.exploit_db_url, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                df = pd.read_csv(response.raw, usecols=['cve', 'description', 'file', 'date'], dtype=str, engine='c')
+            df = df[df['cve'].notna()]
             
-            # Parse CSV content
-            from io import StringIO
-            df = pd.read_csv(StringIO(response.text))
-            
-            exploits = []
-            for _, row in df.iterrows():
-                if pd.notna(row.get('cve')):
-                    exploit_data = {
-                        'cve_id': row.get('cve'),
-                        'exploit_title': row.get('description'),
-                        'exploit_code': row.get('file'),
-                        'source': 'exploit-db',
-                        'date_added': row.get('date')
-                    }
-                    exploits.append(exploit_data)
-                    self.db.insert_exploit(exploit_data)
+            # itertuples tanpa index/namedtuple: jauh lebih cepat dari iterrows
+            exploits = [
+                {
+                    'cve_id': cve_id,
+                    'exploit_title': description,
+                    'exploit_code': file,
+                    'source': 'exploit-db',
+                    'date_added': date
+                }
+                for cve_id, description, file, date
+                in df[['cve', 'description', 'file', 'date']].itertuples(index=False, name=None)
+            ]
             
+            self.db.insert_exploits_bulk(exploits)
             logger.info(f"Scraped {len(exploits)} exploits")
             return exploits
             
@@ -105,12 +175,10 @@ class CVEScraper:
         """Scrape MITRE ATT&CK framework data"""
         logger.info("Scraping MITRE ATT&CK data")
         
-        attack_url = "https://raw.githubusercontent.com/mitre/cti/master/enterprise-attack/enterprise-attack.json"
-        
         try:
-            response = self.session.get(attack_url)
+            response = self.session.get(MITRE_ATTACK_URL)
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except Exception as e:
             logger.error(f"Error scraping MITRE ATT&CK: {e}")
             return {}
@@ -153,5 +221,4 @@ class CVEScraper:
     
     def _extract_references(self, cve: Dict) -> List[str]:
         """Extract reference URLs"""
-        references = cve.get('references', [])
-        return [ref.get('url', '') for ref in references]
+        return [ref['url'] for ref in cve.get('references', ()) if 'url' in ref]
@@ -3,18 +3,25 @@
 CVE Analyst System - Quick Install Script (Python Version)
 Cross-platform installer for CVE Analyst System
 
-Usage: python quick_install.py
+Usage: python quick_install.py [--yes] [--skip-docker] [--no-download]
 """
 
+import argparse
 import os
 import sys
+import json
 import subprocess
 import platform
+import random
+import time
 import urllib.request
 import urllib.error
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import getpass
+import functools
+import hashlib
 
 # Colors for cross-platform terminal output
 class Colors:
@@ -79,19 +86,98 @@ def run_command(command, shell=True, check=True):
     except FileNotFoundError:
         return False, "", "Command not found"
 
+@functools.lru_cache(maxsize=None)
 def check_command_exists(command):
-    """Check if a command exists in PATH"""
+    """Check if a command exists in PATH (cached; cache_clear() if PATH changes)"""
     return shutil.which(command) is not None
 
-def download_file(url, filename):
-    """Download file from URL"""
+DOWNLOAD_CHUNK_SIZE = 65536
+DOWNLOAD_TIMEOUT = 30
+
+DOWNLOAD_RETRIES = 5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+DOWNLOAD_MANIFEST = '.download_manifest'
+
+ENV_TEMPLATE = """# CVE Analyst System Configuration
+NVD_API_KEY={nvd_key}
+MODEL_NAME=deepseek-ai/deepseek-coder-1.3b-instruct
+API_PORT=8021
+UI_PORT=7860
+MAX_LENGTH=2048
+BATCH_SIZE=4
+UPDATE_INTERVAL_HOURS=6
+LOG_LEVEL=INFO
+"""
+
+def load_download_manifest():
+    """Load filename -> ETag map from previous installer runs"""
     try:
-        print(f"Downloading {filename}...")
-        urllib.request.urlretrieve(url, filename)
-        return True
-    except urllib.error.URLError as e:
-        print_error(f"Failed to download {filename}: {e}")
-        return False
+        with open(DOWNLOAD_MANIFEST, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_download_manifest(manifest):
+    """Persist filename -> ETag map for the next run"""
+    with open(DOWNLOAD_MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def get_remote_info(url):
+    """HEAD the URL; returns (Content-Length or None, ETag or None)"""
+    try:
+        request = urllib.request.Request(url, method='HEAD')
+        with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+            length = response.headers.get('Content-Length')
+            return (int(length) if length else None), response.headers.get('ETag')
+    except (urllib.error.URLError, OSError, ValueError):
+        return None, None
+
+def download_file(url, filename, manifest=None):
+    """Download file from URL, streaming it to disk in chunks; skips complete files,
+    resumes partial ones with a Range request and retries transient errors"""
+    path = Path(filename)
+    remote_size, etag = get_remote_info(url)
+    
+    # Upstream berubah (ETag beda dari run sebelumnya): buang salinan lokal
+    if manifest is not None and etag and manifest.get(filename) not in (None, etag):
+        try:
+            path.unlink()
+        except FileNotFoundError:  # missing_ok butuh Python 3.8+
+            pass
+    
+    print(f"Downloading {filename}...")
+    for attempt in range(DOWNLOAD_RETRIES):
+        offset = path.stat().st_size if path.exists() else 0
+        if remote_size is not None and offset == remote_size:
+            print(f"{filename} already complete, skipping")
+            break
+        if remote_size is None or offset > remote_size:
+            offset = 0
+        
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        try:
+            request = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+                # 206 = server menerima Range, lanjutkan; 200 = tulis ulang dari awal
+                mode = 'ab' if response.status == 206 else 'wb'
+                with open(filename, mode) as f:
+                    shutil.copyfileobj(response, f, length=DOWNLOAD_CHUNK_SIZE)
+            break
+        except (urllib.error.URLError, OSError) as e:
+            # 4xx (selain 429) tidak akan berubah dengan retry
+            permanent = isinstance(e, urllib.error.HTTPError) and e.code not in RETRY_STATUS
+            if permanent or attempt == DOWNLOAD_RETRIES - 1:
+                print_error(f"Failed to download {filename}: {e}")
+                return False
+            # Exponential backoff 1s, 2s, 4s, 8s (maks) + jitter
+            delay = min(2 ** attempt, 8) + random.random()
+            print_warning(f"Download of {filename} failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+    
+    if manifest is not None and etag:
+        manifest[filename] = etag
+    return True
 
 def is_admin():
     """Check if running with admin privileges"""
@@ -104,6 +190,9 @@ def is_admin():
     except:
         return False
 
+# pip executable resolved by check_prerequisites
+PIP_CMD = None
+
 def check_prerequisites():
     """Check system prerequisites"""
     print_step("Checking prerequisites...")
@@ -119,15 +208,17 @@ def check_prerequisites():
         sys.exit(1)
     print_success(f"Python {sys.version.split()[0]} found")
     
-    # Check pip
-    if not check_command_exists('pip') and not check_command_exists('pip3'):
+    # Check pip (pip3 diutamakan; hasilnya dipakai ulang saat install requirements)
+    global PIP_CMD
+    PIP_CMD = next((cmd for cmd in ('pip3', 'pip') if check_command_exists(cmd)), None)
+    if PIP_CMD is None:
         print_error("pip is required but not found")
         sys.exit(1)
     print_success("pip found")
     
     return True
 
-def install_docker():
+def install_docker(assume_yes=False):
     """Install Docker based on platform"""
     system = platform.system().lower()
     
@@ -145,17 +236,68 @@ def install_docker():
         print_warning("Docker not found. Please install Docker Desktop for Windows:")
         print("https://docs.docker.com/desktop/install/windows-install/")
     
+    # Unattended: tidak ada yang bisa menginstal Docker sekarang, gagal cepat
+    if assume_yes:
+        return False
+    
     response = input("Have you installed Docker? Continue? (y/N): ").lower()
     return response.startswith('y')
 
-def check_docker():
+# Version probes, dijalankan bersamaan sekali per run
+PROBES = {
+    'docker': 'docker --version',
+    'docker-compose': 'docker-compose --version',
+    'compose-v2': 'docker compose version',
+}
+
+# Hasil probe yang sukses disimpan antar run, per PATH, selama PROBE_CACHE_TTL
+PROBE_CACHE = Path.home() / '.cve_installer_cache.json'
+PROBE_CACHE_TTL = 86400
+
+def load_probe_cache():
+    """Load the persisted probe cache; empty on a missing or corrupt file"""
+    try:
+        with open(PROBE_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_probe_cache(cache):
+    """Atomically persist the probe cache"""
+    tmp_path = PROBE_CACHE.with_name(PROBE_CACHE.name + '.tmp')
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, PROBE_CACHE)
+    except OSError:
+        pass  # cache hanya optimisasi
+
+@functools.lru_cache(maxsize=None)
+def run_probes():
+    """Run all version probes concurrently; returns name -> (success, stdout, stderr)"""
+    key = hashlib.sha1(os.environ.get('PATH', '').encode()).hexdigest()
+    entry = load_probe_cache().get(key)
+    if not entry or entry.get('ts', 0) <= time.time() - PROBE_CACHE_TTL:
+        entry = {'ts': time.time(), 'probes': {}}
+    
+    results = {name: tuple(result) for name, result in entry['probes'].items() if name in PROBES}
+    pending = [name for name in PROBES if name not in results]
+    if pending:
+        with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            results.update(zip(pending, pool.map(lambda name: run_command(PROBES[name], check=False), pending)))
+        # Probe gagal tidak di-cache supaya dicoba lagi di run berikutnya
+        entry['probes'] = {name: result for name, result in results.items() if result[0]}
+        save_probe_cache({key: entry})
+    return results
+
+def check_docker(assume_yes=False):
     """Check Docker installation"""
     if not check_command_exists('docker'):
         print_warning("Docker not found.")
-        return install_docker()
+        return install_docker(assume_yes)
     
     # Test docker command
-    success, stdout, stderr = run_command('docker --version')
+    success, stdout, stderr = run_probes()['docker']
     if not success:
         print_error("Docker is installed but not working properly")
         print_error(f"Error: {stderr}")
@@ -168,13 +310,13 @@ def check_docker_compose():
     """Check Docker Compose installation"""
     # Check for docker-compose command
     if check_command_exists('docker-compose'):
-        success, stdout, stderr = run_command('docker-compose --version')
+        success, stdout, stderr = run_probes()['docker-compose']
         if success:
             print_success(f"Docker Compose found: {stdout.strip()}")
             return True
     
     # Check for docker compose (v2)
-    success, stdout, stderr = run_command('docker compose version')
+    success, stdout, stderr = run_probes()['compose-v2']
     if success:
         print_success(f"Docker Compose (v2) found: {stdout.strip()}")
         return True
@@ -183,7 +325,7 @@ def check_docker_compose():
     print("Please ensure Docker Compose is installed with Docker Desktop")
     return False
 
-def create_project_directory():
+def create_project_directory(assume_yes=False):
     """Create and setup project directory"""
     project_dir = "cve-analyst-system"
     print_step(f"Creating project directory: {project_dir}")
@@ -192,7 +334,7 @@ def create_project_directory():
     
     if project_path.exists():
         print_warning(f"Directory {project_dir} already exists")
-        response = input("Do you want to continue? (y/N): ").lower()
+        response = 'y' if assume_yes else input("Do you want to continue? (y/N): ").lower()
         if not response.startswith('y'):
             sys.exit(1)
     
@@ -213,12 +355,17 @@ def download_project_files():
         "Dockerfile": f"{base_url}/Dockerfile"
     }
     
+    # Download paralel: total waktu ~ file paling lambat, bukan jumlah semuanya
+    manifest = load_download_manifest()
     success_count = 0
-    for filename, url in files.items():
-        if download_file(url, filename):
-            success_count += 1
-        else:
-            print_warning(f"Failed to download {filename}, continuing...")
+    with ThreadPoolExecutor(max_workers=len(files)) as pool:
+        futures = {pool.submit(download_file, url, filename, manifest): filename for filename, url in files.items()}
+        for future in as_completed(futures):
+            if future.result():
+                success_count += 1
+            else:
+                print_warning(f"Failed to download {futures[future]}, continuing...")
+    save_download_manifest(manifest)
     
     if success_count > 0:
         print_success(f"Downloaded {success_count}/{len(files)} files")
@@ -230,38 +377,24 @@ def download_project_files():
     
     return success_count > 0
 
-def create_env_file():
+def create_env_file(assume_yes=False):
     """Create .env configuration file"""
     print_step("Creating configuration...")
     
-    env_content = """# CVE Analyst System Configuration
-NVD_API_KEY=
-MODEL_NAME=deepseek-ai/deepseek-coder-1.3b-instruct
-API_PORT=8021
-UI_PORT=7860
-MAX_LENGTH=2048
-BATCH_SIZE=4
-UPDATE_INTERVAL_HOURS=6
-LOG_LEVEL=INFO
-"""
-    
-    with open('.env', 'w') as f:
-        f.write(env_content)
+    # Ask for NVD API key (unattended: from the environment)
+    if assume_yes:
+        nvd_key = os.getenv('NVD_API_KEY', '').strip()
+    else:
+        print()
+        nvd_key = getpass.getpass("Enter your NVD API Key (optional, press Enter to skip): ").strip()
     
-    # Ask for NVD API key
-    print()
-    nvd_key = getpass.getpass("Enter your NVD API Key (optional, press Enter to skip): ").strip()
+    # Tulis sekali ke file sementara lalu rename atomik: .env tidak pernah setengah jadi
+    tmp_path = '.env.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(ENV_TEMPLATE.format(nvd_key=nvd_key))
+    os.replace(tmp_path, '.env')
     
     if nvd_key:
-        # Update .env file
-        with open('.env', 'r') as f:
-            content = f.read()
-        
-        content = content.replace('NVD_API_KEY=', f'NVD_API_KEY={nvd_key}')
-        
-        with open('.env', 'w') as f:
-            f.write(content)
-        
         print_success("NVD API Key configured")
 
 def install_python_requirements():
@@ -269,7 +402,7 @@ def install_python_requirements():
     requirements_file = Path("requirements.txt")
     if requirements_file.exists():
         print_step("Installing Python requirements...")
-        pip_cmd = 'pip3' if check_command_exists('pip3') else 'pip'
+        pip_cmd = PIP_CMD or ('pip3' if check_command_exists('pip3') else 'pip')
         success, stdout, stderr = run_command(f'{pip_cmd} install -r requirements.txt')
         
         if success:
@@ -315,39 +448,52 @@ def print_final_message():
     print()
     print(f"{Colors.GREEN}Happy analyzing! 🔍{Colors.NC}")
 
-def main():
+def parse_args(argv=None):
+    """Parse installer flags"""
+    parser = argparse.ArgumentParser(description="CVE Analyst System quick installer")
+    parser.add_argument('--yes', '-y', action='store_true',
+                        default=os.getenv('CVE_INSTALL_YES') == '1',
+                        help='Non-interactive: answer yes to prompts, read NVD_API_KEY from env (CVE_INSTALL_YES=1)')
+    parser.add_argument('--skip-docker', action='store_true', help='Skip Docker checks and system start')
+    parser.add_argument('--no-download', action='store_true', help='Skip downloading project files')
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main installation function"""
+    args = parse_args(argv)
     try:
         print_banner()
         
         # Check prerequisites
         check_prerequisites()
         
-        # Check Docker
-        if not check_docker():
-            print_error("Docker installation required. Please install Docker and try again.")
-            sys.exit(1)
-        
-        # Check Docker Compose
-        if not check_docker_compose():
-            print_error("Docker Compose is required. Please ensure it's properly installed.")
-            sys.exit(1)
+        if not args.skip_docker:
+            # Check Docker
+            if not check_docker(args.yes):
+                print_error("Docker installation required. Please install Docker and try again.")
+                sys.exit(1)
+            
+            # Check Docker Compose
+            if not check_docker_compose():
+                print_error("Docker Compose is required. Please ensure it's properly installed.")
+                sys.exit(1)
         
         # Create project directory
-        project_path = create_project_directory()
+        project_path = create_project_directory(args.yes)
         
         # Download project files
-        if not download_project_files():
+        if not args.no_download and not download_project_files():
             print_warning("Some files failed to download. You may need to download them manually.")
         
         # Create configuration
-        create_env_file()
+        create_env_file(args.yes)
         
         # Install Python requirements
         install_python_requirements()
         
-        # Start system
-        start_system()
+        # Start system (via Docker)
+        if not args.skip_docker:
+            start_system()
         
         # Print final instructions
         print_final_message()
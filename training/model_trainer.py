@@ -1,39 +1,97 @@
 """
 Model training module using QLoRA fine-tuning
 """
+import hashlib
 import json
 import logging
-from typing import List, Dict, Tuple
+import os
+import tempfile
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
 from pathlib import Path
 
 from config.settings import CVEConfig
 
 logger = logging.getLogger(__name__)
 
+# Samples per Arrow record batch when building the training table
+ARROW_BATCH_SIZE = 10_000
+# File tok_cache dengan key lain yang lebih muda dari ini dianggap milik run yang masih jalan
+TOK_CACHE_GRACE = 3600
+
 class CVEModelTrainer:
     """Fine-tune DeepSeek-Coder menggunakan QLoRA"""
     
     def __init__(self, config: CVEConfig):
         self.config = config
         
+    @staticmethod
+    def _compute_dtype():
+        """bf16 on GPUs that support it, fp16 otherwise"""
+        import torch
+        
+        if torch.cuda.is_available() and torch.cuda.is_bf16_supported():
+            return torch.bfloat16
+        return torch.float16
+    
+    @staticmethod
+    def _attn_implementation(dtype) -> str:
+        """FlashAttention-2 when flash-attn is installed and the GPU runs bf16, SDPA otherwise"""
+        import torch
+        from importlib.util import find_spec
+        
+        if dtype is torch.bfloat16 and find_spec("flash_attn") is not None:
+            return "flash_attention_2"
+        return "sdpa"
+    
     def prepare_model_and_tokenizer(self):
         """Setup model dan tokenizer untuk fine-tuning"""
         try:
-            from transformers import AutoTokenizer, AutoModelForCausalLM
-            from peft import LoraConfig, TaskType, get_peft_model
-            import torch
+            from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+            from peft import LoraConfig, TaskType, get_peft_model, prepare_model_for_kbit_training
             
             # Load tokenizer
             tokenizer = AutoTokenizer.from_pretrained(self.config.model_name)
             if tokenizer.pad_token is None:
                 tokenizer.pad_token = tokenizer.eos_token
             
-            # Load model dengan quantization
-            model = AutoModelForCausalLM.from_pretrained(
-                self.config.model_name,
-                torch_dtype=torch.float16,
-                device_map="auto",
-                load_in_4bit=True
+            # Load model dengan quantization: NF4 + double-quant, compute bf16 (fp16 di GPU lama)
+            compute_dtype = self._compute_dtype()
+            bnb_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_use_double_quant=True,
+                bnb_4bit_compute_dtype=compute_dtype
+            )
+            # Attention fused (flash/SDPA): FLOPs sama, traffic HBM jauh lebih kecil
+            attn_implementation = self._attn_implementation(compute_dtype)
+            try:
+                model = AutoModelForCausalLM.from_pretrained(
+                    self.config.model_name,
+                    device_map="auto",
+                    quantization_config=bnb_config,
+                    torch_dtype=compute_dtype,
+                    attn_implementation=attn_implementation
+                )
+            except (ImportError, ValueError) as e:
+                if attn_implementation == "sdpa":
+                    raise
+                logger.warning(f"flash_attention_2 unavailable ({e}), falling back to sdpa")
+                model = AutoModelForCausalLM.from_pretrained(
+                    self.config.model_name,
+                    device_map="auto",
+                    quantization_config=bnb_config,
+                    torch_dtype=compute_dtype,
+                    attn_implementation="sdpa"
+                )
+            
+            # Cast layer norm ke fp32 + aktifkan input grads dan gradient checkpointing
+            # (non-reentrant) untuk base 4-bit
+            model = prepare_model_for_kbit_training(
+                model,
+                use_gradient_checkpointing=True,
+                gradient_checkpointing_kwargs={'use_reentrant': False}
             )
             
             # Setup LoRA config
@@ -55,13 +113,10 @@ class CVEModelTrainer:
             logger.error(f"Required libraries not installed: {e}")
             raise
     
-    def format_training_data(self, dataset: List[Dict]) -> List[str]:
-        """Format data untuk training"""
-        formatted_data = []
-        
-        for item in dataset:
-            # Format: Instruction + Input + Output
-            prompt = f"""### Instruction:
+    @staticmethod
+    def format_sample(item: Dict) -> str:
+        """Format satu sample: Instruction + Input + Output"""
+        return f"""### Instruction:
 {item['instruction']}
 
 ### Input:
@@ -69,37 +124,87 @@ class CVEModelTrainer:
 
 ### Response:
 {item['output']}"""
-            
-            formatted_data.append(prompt)
-        
-        return formatted_data
     
-    def train_model(self, dataset: List[Dict]):
+    def format_training_data(self, dataset: List[Dict]) -> List[str]:
+        """Format data untuk training"""
+        return [self.format_sample(item) for item in dataset]
+    
+    @staticmethod
+    def _prune_tok_cache(cache_dir: Path, cache_key: str):
+        """Hapus file tok_cache milik key lain (teks, shard tokenisasi per num_proc, tmp sisa crash)"""
+        cutoff = time.time() - TOK_CACHE_GRACE
+        for path in cache_dir.iterdir():
+            if path.name.startswith(cache_key) or not path.is_file():
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError as e:
+                logger.debug(f"Could not prune {path}: {e}")
+    
+    def train_model(self, dataset: Iterable[Dict]):
         """Train model dengan dataset"""
         try:
+            import pyarrow as pa
             from datasets import Dataset
             from transformers import TrainingArguments, Trainer, DataCollatorForLanguageModeling
             
+            import torch
+            
             logger.info("Starting model training")
+            use_bf16 = self._compute_dtype() is torch.bfloat16
             
-            # Prepare model and tokenizer
-            model, tokenizer = self.prepare_model_and_tokenizer()
+            # Format sample per batch langsung ke Arrow StringArray (IPC stream di disk);
+            # dataset (list atau generator dari file) tidak pernah utuh di memori.
+            # Dikerjakan sebelum load model: dataset rusak gagal tanpa menunggu load 4-bit
+            cache_dir = self.config.model_dir / "tok_cache"
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            digest = hashlib.sha1(f"{self.config.model_name}\0{self.config.max_length}\0".encode())
+            schema = pa.schema([("text", pa.string())])
+            samples = iter(dataset)
+            # Nama unik per run: CLI `train` dan retrain terjadwal tidak saling timpa
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+            os.close(fd)
+            try:
+                with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_stream(sink, schema) as writer:
+                    while batch := [self.format_sample(item) for item in islice(samples, ARROW_BATCH_SIZE)]:
+                        for text in batch:
+                            digest.update(text.encode() + b"\0")
+                        writer.write_batch(pa.record_batch([pa.array(batch, type=pa.string())], schema=schema))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            
+            # Isi sama -> key sama, jadi replace aman walau run lain memakai file lama (mmap)
+            cache_key = digest.hexdigest()[:16]
+            texts_path = cache_dir / f"{cache_key}-texts.arrow"
+            os.replace(tmp_path, texts_path)
+            self._prune_tok_cache(cache_dir, cache_key)
             
-            # Format training data
-            formatted_data = self.format_training_data(dataset)
+            # Create dataset: mmap file Arrow, tanpa salinan/parse ulang
+            train_dataset = Dataset.from_file(str(texts_path))
             
-            # Create dataset
-            train_dataset = Dataset.from_dict({"text": formatted_data})
+            # Prepare model and tokenizer
+            model, tokenizer = self.prepare_model_and_tokenizer()
             
             def tokenize_function(examples):
                 return tokenizer(
                     examples["text"],
                     truncation=True,
-                    padding=True,
+                    # Padding per batch oleh data collator, bukan di sini
+                    padding=False,
                     max_length=self.config.max_length
                 )
             
-            tokenized_dataset = train_dataset.map(tokenize_function, batched=True)
+            # Cache hasil tokenisasi (Arrow) per isi dataset + tokenizer + max_length;
+            # run berikutnya dengan data yang sama tinggal mmap file cache
+            tokenized_dataset = train_dataset.map(
+                tokenize_function,
+                batched=True,
+                num_proc=min(8, os.cpu_count() or 1),
+                load_from_cache_file=True,
+                cache_file_name=str(cache_dir / f"{cache_key}.arrow")
+            )
             
             # Data collator
             data_collator = DataCollatorForLanguageModeling(
@@ -107,20 +212,34 @@ class CVEModelTrainer:
                 mlm=False
             )
             
+            # KV cache tidak kompatibel dengan gradient checkpointing
+            model.config.use_cache = False
+            
             # Training arguments
             training_args = TrainingArguments(
                 output_dir=str(self.config.model_dir / "checkpoints"),
                 overwrite_output_dir=True,
                 num_train_epochs=3,
                 per_device_train_batch_size=self.config.batch_size,
+                gradient_accumulation_steps=self.config.gradient_accumulation_steps,
+                # Recompute aktivasi di backward: memori aktivasi ~sqrt(N)
+                gradient_checkpointing=True,
+                gradient_checkpointing_kwargs={'use_reentrant': False},
+                optim='paged_adamw_8bit',
                 save_steps=500,
                 save_total_limit=2,
                 prediction_loss_only=True,
                 learning_rate=self.config.learning_rate,
                 warmup_steps=100,
                 logging_steps=50,
-                fp16=True,
-                dataloader_drop_last=True
+                # Mixed precision mengikuti compute dtype 4-bit
+                bf16=use_bf16,
+                fp16=not use_bf16,
+                dataloader_drop_last=True,
+                # Trainer yang meng-compile model; model asli tetap dipakai untuk save
+                torch_compile=torch.cuda.is_available(),
+                # Batch berisi sekuens dengan panjang mirip -> padding minimal
+                group_by_length=True
             )
             
             # Create trainer
@@ -148,7 +267,20 @@ class CVEModelTrainer:
             logger.error(f"Error during training: {e}")
             raise
     
-    def load_dataset_from_file(self, filepath: str) -> List[Dict]:
-        """Load dataset from JSON file"""
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+    def load_dataset_from_file(self, filepath: str) -> Iterator[Dict]:
+        """Stream dataset records from a JSON array file"""
+        # Dibuka sekarang (bukan saat iterasi) supaya path salah langsung gagal
+        f = open(filepath, 'rb')
+        return _iter_json_array(f)
+
+
+def _iter_json_array(f) -> Iterator[Dict]:
+    """Yield the items of a JSON array from an open binary file, then close it"""
+    with f:
+        try:
+            import ijson
+        except ImportError:  # tanpa ijson, file dibaca sekaligus
+            yield from json.load(f)
+            return
+        
+        yield from ijson.items(f, 'item')
@@ -1,6 +1,7 @@
 import os
 import time
-import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 
@@ -22,6 +23,26 @@ from transformers import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# TF32 matmul/conv on Ampere+ (no-op on older GPUs and CPU)
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+
+# Max job log lines kept in memory; older lines are dropped
+JOB_LOG_LINES = int(os.getenv('JOB_LOG_LINES', '2000'))
+
+# Standard Alpaca-style prompt format
+_TMPL = "### Instruction:\n{}\n\n### Input:\n{}\n\n### Response:\n{}"
+
+def preprocess_function(examples, tokenizer):
+    """
+    Format and tokenize a batch of samples.
+    Top-level (not a closure) so its hash is stable for the datasets cache fingerprint.
+    """
+    # Combine instruction, input, and response into a single string for training
+    formatted_texts = list(map(_TMPL.format, examples['Instruction'], examples['Input'], examples['Response']))
+    # No padding here: the collator pads each batch to its longest sequence
+    return tokenizer(formatted_texts, truncation=True, padding=False, max_length=512)
+
 class TrainingManager:
     """
     A class to manage the lifecycle of model training jobs.
@@ -33,6 +54,10 @@ class TrainingManager:
         self.trained_models = {}
         self.active_jobs = 0
         self.config = config # Should contain paths like models_directory
+        # One training run at a time: an in-process Trainer already spreads over
+        # every visible GPU, so extra jobs wait in the executor queue instead of
+        # loading a second model into VRAM
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="training")
         # self._load_state() # Method to load jobs and models from disk
 
     def _save_state(self):
@@ -85,6 +110,14 @@ class TrainingManager:
                 logger.error(f"Job {job_id} not found for training.")
                 return
 
+            # Cancelled while waiting in the executor queue
+            if job.status == 'cancelled':
+                logger.info(f"Job {job_id} was cancelled before it started.")
+                return
+
+            # Keep only the tail of the job log in memory (and in saved state)
+            job.logs = deque(job.logs, maxlen=JOB_LOG_LINES)
+
             try:
                 # --- 1. SETUP AND INITIALIZATION ---
                 job.status = 'initializing'
@@ -103,6 +136,7 @@ class TrainingManager:
                     
                 model = AutoModelForCausalLM.from_pretrained(
                     job.base_model,
+                    attn_implementation="sdpa", # Fused attention kernel instead of eager
                     # For memory efficiency on GPUs, consider quantization:
                     # load_in_8bit=True,
                     # device_map="auto",
@@ -114,17 +148,16 @@ class TrainingManager:
                 # Load from the CSV generated earlier
                 raw_dataset = load_dataset('csv', data_files={'train': job.dataset_path})['train']
 
-                # Format and tokenize the dataset
-                def preprocess_function(examples):
-                    # Combine instruction, input, and response into a single string for training
-                    formatted_texts = []
-                    for instr, inp, resp in zip(examples['Instruction'], examples['Input'], examples['Response']):
-                        # Standard Alpaca-style prompt format
-                        text = f"### Instruction:\n{instr}\n\n### Input:\n{inp}\n\n### Response:\n{resp}"
-                        formatted_texts.append(text)
-                    return tokenizer(formatted_texts, truncation=True, padding='max_length', max_length=512)
-
-                tokenized_dataset = raw_dataset.map(preprocess_function, batched=True, remove_columns=raw_dataset.column_names)
+                # Format and tokenize the dataset; parallel, and reused from the
+                # datasets cache when the CSV and function fingerprint are unchanged
+                tokenized_dataset = raw_dataset.map(
+                    preprocess_function,
+                    batched=True,
+                    num_proc=min(8, os.cpu_count() or 1),
+                    load_from_cache_file=True,
+                    fn_kwargs={'tokenizer': tokenizer},
+                    remove_columns=raw_dataset.column_names,
+                )
                 
                 # Split into training and validation sets
                 train_val_split = tokenized_dataset.train_test_split(test_size=0.1, seed=42)
@@ -134,6 +167,9 @@ class TrainingManager:
                 job.logs.append(f"Dataset processed. Training samples: {len(train_dataset)}, Validation samples: {len(eval_dataset)}")
                 
                 # --- 4. CONFIGURE TRAINING ARGUMENTS ---
+                # bf16 where supported (no loss scaling), fp16 on older GPUs
+                use_cuda = torch.cuda.is_available()
+                bf16_ok = use_cuda and torch.cuda.is_bf16_supported()
                 training_args = TrainingArguments(
                     output_dir=model_output_dir,
                     num_train_epochs=job.epochs,
@@ -148,10 +184,14 @@ class TrainingManager:
                     logging_steps=10, # Log progress every 10 steps
                     evaluation_strategy="epoch", # Evaluate at the end of each epoch
                     save_strategy="epoch",       # Save a checkpoint at the end of each epoch
-                    fp16=torch.cuda.is_available(), # Use mixed-precision if a GPU is available
+                    bf16=bf16_ok,
+                    fp16=use_cuda and not bf16_ok,
+                    tf32=bf16_ok, # TF32 needs Ampere+, same gate as bf16
+                    torch_compile=use_cuda, # Trainer compiles its wrapped copy; saving uses the plain model
                     load_best_model_at_end=True, # Load the best model based on validation loss
                     metric_for_best_model="loss",
                     report_to="none", # Disable reporting to external services like W&B/TensorBoard
+                    group_by_length=True, # Batch similar-length samples to minimize padding
                 )
                 
                 # Data collator for language modeling prepares batches for training
@@ -205,8 +245,6 @@ class TrainingManager:
                     job.end_time = datetime.now().isoformat()
                 self._save_state()
 
-        # --- Start the worker in a background thread ---
-        thread = threading.Thread(target=training_worker)
-        thread.daemon = True # Allows the main program to exit even if the thread is running
-        thread.start()
+        # --- Queue the worker on the bounded training pool ---
+        self._pool.submit(training_worker)
 
@@ -1,8 +1,11 @@
 """
 Logging configuration module
 """
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 def setup_logging(log_level: str = "INFO", log_file: str = "cve_analyst.log"):
@@ -12,16 +15,33 @@ def setup_logging(log_level: str = "INFO", log_file: str = "cve_analyst.log"):
     log_path = Path("logs")
     log_path.mkdir(exist_ok=True)
     
+    # Format tidak memakai thread/process info; lewati lookup-nya per record
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    
+    # Logger hanya enqueue; file/stdout ditulis oleh thread QueueListener
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(log_path / log_file)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # Pesan mentah saja; format lengkap diterapkan oleh handler di listener
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    
     # Configure logging
     logging.basicConfig(
         level=getattr(logging, log_level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_path / log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
+        handlers=[queue_handler]
     )
     
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
     # Set specific loggers
     logging.getLogger("transformers").setLevel(logging.WARNING)
     logging.getLogger("torch").setLevel(logging.WARNING)
@@ -1,7 +1,35 @@
 import argparse
+import importlib.util
+import json
+import os
+from pathlib import Path
+
+# Rust hf_transfer: beberapa koneksi ranged paralel per shard. Harus di-set
+# sebelum huggingface_hub di-import, dan hanya jika paketnya terpasang.
+# Di CDN edge yang lambat, set juga HF_HUB_DOWNLOAD_TIMEOUT agar tidak hang.
+if importlib.util.find_spec("hf_transfer") is not None:
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
+from huggingface_hub import snapshot_download
 from transformers import AutoTokenizer, AutoModelForCausalLM
 from transformers.utils import logging as hf_logging
 
+# Config + tokenizer files, lalu satu format weight saja (safetensors, .bin hanya jika tidak ada)
+META_PATTERNS = ["*.json", "*.model", "*.txt", "*.tiktoken"]
+WEIGHT_PATTERNS = (["*.safetensors"], ["*.bin"])
+
+def _weights_complete(model_path: str) -> bool:
+    """config.json present and every weight shard (per the index, if sharded) on disk"""
+    path = Path(model_path)
+    if not (path / "config.json").exists():
+        return False
+    for index_name in ("model.safetensors.index.json", "pytorch_model.bin.index.json"):
+        index = path / index_name
+        if index.exists():
+            shards = set(json.loads(index.read_text())["weight_map"].values())
+            return all((path / shard).exists() for shard in shards)
+    return any(path.glob("*.safetensors")) or any(path.glob("*.bin"))
+
 def download_model(model_name: str, cache_dir: str = None):
     hf_logging.set_verbosity_info()
     logger = hf_logging.get_logger("transformers")
@@ -10,12 +38,27 @@ def download_model(model_name: str, cache_dir: str = None):
     if cache_dir:
         print(f"Using custom cache directory: {cache_dir}")
 
-    # Download tokenizer
-    tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
+    # Fast path: snapshot already fully cached, no Hub round-trips
+    try:
+        model_path = snapshot_download(model_name, cache_dir=cache_dir, local_files_only=True)
+    except FileNotFoundError:
+        model_path = None
+
+    if model_path and _weights_complete(model_path):
+        print("✅ Model already cached, skipping download.")
+    else:
+        # Shards downloaded in parallel
+        for weights in WEIGHT_PATTERNS:
+            model_path = snapshot_download(model_name, cache_dir=cache_dir, allow_patterns=META_PATTERNS + weights,
+                                           max_workers=8, etag_timeout=30)
+            if _weights_complete(model_path):
+                break
+
+    # Load from the local snapshot to verify tokenizer and weights
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
     print("✅ Tokenizer downloaded.")
 
-    # Download model
-    model = AutoModelForCausalLM.from_pretrained(model_name, cache_dir=cache_dir)
+    model = AutoModelForCausalLM.from_pretrained(model_path)
     print("✅ Model downloaded.")
 
     print("🎉 Model and tokenizer successfully downloaded and cached.")